@@ -0,0 +1,127 @@
+import hashlib
+import json
+
+import dateutil.parser
+from flask import Blueprint, Response, abort, request, url_for
+from werkzeug.http import is_resource_modified
+
+from details import artist_detail, venue_detail
+from directory import venue_directory
+from models import db, Venue, Artist, live
+from page_cache import cached
+from show_listing import SHOWS_PER_PAGE, SHOWS_STREAM_BATCH, show_page
+from trending import TRENDING_LIMIT, trending_venues
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Columns that only exist for search and filtering.
+PRIVATE_COLUMNS = ('genre_mask',)
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+# ----------------------------------------------------------------------------#
+# JSON API.
+# ----------------------------------------------------------------------------#
+
+# /api/v1 serves the data behind the venue, artist and show pages as JSON for
+# the mobile client. A venue's or artist's schedule_updated_at changes with
+# every write that changes its detail, so it makes a strong ETag: a client
+# holding the current one gets a 304 after a primary-key lookup, and the
+# serialized body is cached under the same version in the page cache. Lists are
+# cached like their HTML pages and tagged with a hash of the body. orjson is
+# used when installed.
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(',', ':'), default=lambda value: value.isoformat())
+
+
+def _json(body, etag):
+    response = Response(body, mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _listing(name, entities, build):
+    body = cached(f'api:{name}', entities, lambda: dumps(build()))
+    return _json(body, hashlib.sha1(body.encode()).hexdigest())
+
+
+def _detail(model, entity_id, build):
+    row = db.session.query(model.schedule_updated_at).filter(model.id == entity_id, live(model)).first()
+    if row is None:
+        abort(404)
+
+    def render():
+        data = build(entity_id)
+        if data is None:
+            abort(404)
+        for column in PRIVATE_COLUMNS:
+            data.pop(column, None)
+        return dumps(data)
+
+    # Without a schedule_updated_at (see feeds._validators) there is no version
+    # to tag or cache the body under.
+    if row.schedule_updated_at is None:
+        return _json(render(), None)
+    etag = f'{model.__tablename__.lower()}-{entity_id}-{row.schedule_updated_at.timestamp():.6f}'
+    if not is_resource_modified(request.environ, etag=etag):
+        return _json('', etag)
+    return _json(cached(f'api:{etag}', [], render), etag)
+
+
+@api_v1.route('/venues')
+def venues():
+    return _listing('venues', ['venues'], lambda: {'areas': venue_directory()})
+
+
+@api_v1.route('/venues/trending')
+def trending():
+    # ?limit=N, up to 100 venues with the most shows in the next TRENDING_DAYS days.
+    limit = min(max(request.args.get('limit', TRENDING_LIMIT, type=int), 1), 100)
+    return _listing(f'trending:{limit}', ['venues'], lambda: {'venues': trending_venues(limit)})
+
+
+@api_v1.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return _detail(Venue, venue_id, venue_detail)
+
+
+@api_v1.route('/artists')
+def artists():
+    return _listing('artists', ['artists'], lambda: {'artists': [
+        {'id': artist_id, 'name': name} for artist_id, name in
+        db.session.query(Artist.id, Artist.name).filter(live(Artist)).order_by(Artist.id)]})
+
+
+@api_v1.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return _detail(Artist, artist_id, artist_detail)
+
+
+@api_v1.route('/shows')
+def shows():
+    # Same filters and cursor as /shows: ?from=&to=&upcoming=True&cursor=&limit=
+    args = request.args
+    filters = {
+        'start': args.get('from', type=dateutil.parser.parse),
+        'end': args.get('to', type=dateutil.parser.parse),
+        'upcoming_only': args.get('upcoming') == 'True'
+    }
+    limit = min(max(args.get('limit', SHOWS_PER_PAGE, type=int), 1), SHOWS_STREAM_BATCH)
+    try:
+        data, next_cursor = show_page(args.get('cursor'), limit, **filters)
+    except ValueError:
+        abort(400)
+    body = dumps({
+        'shows': data,
+        'next': url_for('api_v1.shows', **dict(args.to_dict(), cursor=next_cursor)) if next_cursor else None
+    })
+    return _json(body, hashlib.sha1(body.encode()).hexdigest())
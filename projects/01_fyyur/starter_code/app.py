@@ -2,16 +2,35 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-import babel
 import dateutil.parser
 import logging
-from flask import Flask, render_template, request, flash, redirect, url_for
+from flask import Flask, render_template, stream_template, request, flash, redirect, url_for, abort, jsonify
 from flask_migrate import Migrate
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from logging import Formatter, FileHandler
 
+from api import api_v1
+from bookings import BOOKING_CHECK_LIMIT, check_bookings, find_conflicts, local_time, lock_booking
+from cli import fyyur_cli
+from counters import counters_cli, record_show
+from deletion import delete_entity  # also registers `flask fyyur purge-deleted`
+from details import artist_detail, venue_detail
+from directory import venue_directory
+from feeds import artist_json, touch_schedules, venue_ics
 from forms import *
+from formatting import format_datetime, format_datetimes
+from genres import browse, genre_names, set_genres
+import archive  # registers `flask fyyur archive-shows`
+import generator  # registers `flask fyyur generate`
+import importer  # registers `flask fyyur import`
+from instrumentation import init_instrumentation
+from models import db, Venue, Artist, Show, live
+from page_cache import artist_entities, bump, cached, init_page_cache, venue_entities
+from pooling import init_pooling
+from routing import init_routing
+from search import search
+from show_listing import SHOWS_PER_PAGE, SHOWS_STREAM_BATCH, iter_shows, show_page
+from trending import trending_venues
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -20,8 +39,15 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+init_pooling(app)
+db.init_app(app)
+init_routing(app)
+init_page_cache(app)
+init_instrumentation(app)
+app.register_blueprint(api_v1)
 migrate = Migrate(app, db)
+app.cli.add_command(counters_cli)
+app.cli.add_command(fyyur_cli)
 
 
 # DONE: connect to a local postgresql database
@@ -30,103 +56,16 @@ migrate = Migrate(app, db)
 # Models.
 # ----------------------------------------------------------------------------#
 
-
-# DONE: implement any missing fields, as a database migration using Flask-Migrate
-
-
-# venuegenres = db.Table('venuegenre',
-#                        db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
-#                        db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True)
-#                        )
-
-# DONE: implement any missing fields, as a database migration using Flask-Migrate
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    seeking_talent = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String(120))
-    shows = db.relationship('Show', backref='venue', lazy=True)
-
-    # genres = db.relationship('Genre', secondary=venuegenres, lazy='subquery', backref=db.backref('Venues', lazy=True))
-
-    def __repr__(self):
-        return f'<Venue {self.id} -  {self.name}, {self.city}/{self.state}>'
-
-
-# artistgenres = db.Table('artistgenre',
-#                         db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
-#                         db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True)
-#                         )
-
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    seeking_venue = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String(120))
-    shows = db.relationship('Show', backref='artist', lazy=True)
-    # genres = db.relationship('Genre', secondary=artistgenres, lazy='subquery', backref=db.backref('Artists', lazy=True))
-
-
-# shows = db.Table('Show',
-#                  db.Column('id', db.Integer, primary_key=True),
-#                  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
-#                  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
-#                  db.Column('start_time', db.DateTime, nullable=False)
-#                  )
-
-# DONE Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
-class Show(db.Model):
-    __tablename__ = 'Show'
-
-    id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
-
-
-# class Genre(db.Model):
-#     __tablename__ = 'Genre'
-#
-#     id = db.Column(db.Integer, primary_key=True)
-#     name = db.Column(db.String(30), nullable=False)
+# Models live in models.py so helper modules can import them without importing the app.
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = value
-    if type(value) != datetime:
-        date = dateutil.parser.parse(value)
-
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
-
+# format_datetime and format_datetimes live in formatting.py.
 app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.filters['datetimes'] = format_datetimes
 
 
 # ----------------------------------------------------------------------------#
@@ -135,7 +74,8 @@ app.jinja_env.filters['datetime'] = format_datetime
 
 @app.route('/')
 def index():
-    return render_template('pages/home.html')
+    # Cached with the directory: every write that can move the ranking bumps 'venues'.
+    return cached('index', ['venues'], lambda: render_template('pages/home.html', venues=trending_venues()))
 
 
 #  Venues
@@ -145,29 +85,7 @@ def index():
 def venues():
     # DONE: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-
-    # With help from the knowledge - https://knowledge.udacity.com/questions/112669
-    cities = Venue.query.with_entities(Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-
-    data = []
-    for city in cities:
-        city_venues = Venue.query.filter_by(state=city.state).filter_by(city=city.city).all()
-        venues = []
-        for venue in city_venues:
-            venues.append({
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(db.session.query(Show).filter(Show.venue_id == venue.id).filter(
-                    Show.start_time > datetime.now()).all())
-            })
-
-        data.append({
-            "city": city.city,
-            "state": city.state,
-            "venues": venues
-        })
-
-    return render_template('pages/venues.html', areas=data);
+    return cached('venues', ['venues'], lambda: render_template('pages/venues.html', areas=venue_directory()))
 
 
 @app.route('/venues/search', methods=['POST'])
@@ -176,42 +94,38 @@ def search_venues():
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
     search_term = request.form.get('search_term', '')
-    venues = Venue.query.filter(Venue.name.like(f"%{search_term}%")).all()
-    count = len(venues)
-    data = []
-    for venue in venues:
-        data.append({
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": len(
-                db.session.query(Show).filter(Show.venue_id == venue.id).filter(Show.start_time > datetime.now()).all())
-        })
-
-    response = {"count": count, "data": data}
+    response = search(Venue, search_term, page=request.form.get('page', 1, type=int))
 
     return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 
+@app.route('/venues/browse')
+def browse_venues():
+    # e.g. /venues/browse?genre=Jazz&state=NY&seeking=True
+    results = browse(Venue, request.args.getlist('genre'), city=request.args.get('city'),
+                     state=request.args.get('state'), seeking=request.args.get('seeking') == 'True',
+                     match_all=request.args.get('match') == 'all', page=request.args.get('page', 1, type=int))
+
+    return render_template('pages/browse.html', results=results, kind='venues')
+
+
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # DONE: replace with real venue data from the venues table, using venue_id
-    data = Venue.query.get(venue_id)
-    data.genres = [Genres[v].value for v in data.genres.split(", ")]
-    data.upcoming_shows = db.session.query(Show).filter(Show.venue_id == venue_id).filter(
-        Show.start_time > datetime.now()).all()
-    for show in data.upcoming_shows:
-        setattr(show, 'artist_name', show.artist.name)
-        setattr(show, 'artist_image_link', show.artist.image_link)
-    data.past_shows = db.session.query(Show).filter(Show.venue_id == venue_id).filter(
-        Show.start_time <= datetime.now()).all()
-    for show in data.past_shows:
-        setattr(show, 'artist_name', show.artist.name)
-        setattr(show, 'artist_image_link', show.artist.image_link)
-    data.past_shows_count = len(data.past_shows)
-    data.upcoming_shows_count = len(data.upcoming_shows)
-
-    return render_template('pages/show_venue.html', venue=data)
+    def render():
+        data = venue_detail(venue_id)
+        if data is None:
+            abort(404)
+        return render_template('pages/show_venue.html', venue=data)
+
+    return cached(f'show_venue:{venue_id}', [f'venue:{venue_id}'], render)
+
+
+@app.route('/venues/<int:venue_id>/shows.ics')
+def venue_schedule(venue_id):
+    # iCalendar feed of the venue's shows for calendar clients; see feeds.py.
+    return venue_ics(venue_id)
 
 
 #  Create Venue
@@ -236,12 +150,14 @@ def create_venue_submission():
     try:
         venue = Venue(name=request.form.get('name'), city=request.form.get('city'), state=request.form.get('state'),
                       address=request.form.get('address'), phone=request.form.get('phone'),
-                      facebook_link=request.form.get('facebook_link'), genres=", ".join(request.form.getlist('genres')),
+                      facebook_link=request.form.get('facebook_link'),
                       website=request.form.get('website'), image_link=request.form.get('image_link'),
                       seeking_talent=request.form.get('seeking_talent') == 'True',
                       seeking_description=request.form.get('seeking_description'))
+        set_genres(venue, request.form.getlist('genres'))
         db.session.add(venue)
         db.session.commit()
+        bump('venues')
         # on successful db insert, flash success
         # on successful db insert, flash success
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
@@ -260,10 +176,12 @@ def create_venue_submission():
 def delete_venue(venue_id):
     # DONE: Complete this endpoint for taking a venue_id, and using
     # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+    # Venues with many shows are hidden at once and purged by `flask fyyur purge-deleted`.
     try:
-        Venue.query.filter_by(id=venue_id).delete()
-        db.session.commit()
-        flash(f"Venue with id= {venue_id} has been successfully deleted.")
+        if delete_entity(Venue, venue_id):
+            flash(f"Venue with id= {venue_id} has been successfully deleted.")
+        else:
+            flash(f"Unable to delete venue {venue_id}.")
     except:
         db.session.rollback()
         flash(f"Unable to delete venue {venue_id}.")
@@ -280,9 +198,8 @@ def delete_venue(venue_id):
 def artists():
     # DONE: replace with real data returned from querying the database
 
-    data = Artist.query.with_entities(Artist.id, Artist.name)
-
-    return render_template('pages/artists.html', artists=data)
+    return cached('artists', ['artists'], lambda: render_template(
+        'pages/artists.html', artists=Artist.query.filter(live(Artist)).with_entities(Artist.id, Artist.name)))
 
 
 @app.route('/artists/search', methods=['POST'])
@@ -291,43 +208,52 @@ def search_artists():
     # search for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     search_term = request.form.get('search_term', '')
-    artists = Artist.query.filter(Artist.name.like(f"%{search_term}%")).all()
-    count = len(artists)
-    data = []
-    for artist in artists:
-        data.append({
-            "id": artist.id,
-            "name": artist.name,
-            "num_upcoming_shows": len(
-                db.session.query(Show).filter(Show.artist_id == artist.id).filter(
-                    Show.start_time > datetime.now()).all())
-        })
-
-    response = {"count": count, "data": data}
+    response = search(Artist, search_term, page=request.form.get('page', 1, type=int))
 
     return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 
+@app.route('/artists/browse')
+def browse_artists():
+    results = browse(Artist, request.args.getlist('genre'), city=request.args.get('city'),
+                     state=request.args.get('state'), seeking=request.args.get('seeking') == 'True',
+                     match_all=request.args.get('match') == 'all', page=request.args.get('page', 1, type=int))
+
+    return render_template('pages/browse.html', results=results, kind='artists')
+
+
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
     # DONE: replace with real artist data from the artist table, using artist_id
-    data = Artist.query.get(artist_id)
-    data.genres = [Genres[v].value for v in data.genres.split(", ")]
-    data.upcoming_shows = db.session.query(Show).filter(Show.artist_id == artist_id).filter(
-        Show.start_time > datetime.now()).all()
-    for show in data.upcoming_shows:
-        setattr(show, 'venue_name', show.venue.name)
-        setattr(show, 'venue_image_link', show.venue.image_link)
-    data.past_shows = db.session.query(Show).filter(Show.artist_id == artist_id).filter(
-        Show.start_time <= datetime.now()).all()
-    for show in data.past_shows:
-        setattr(show, 'venue_name', show.venue.name)
-        setattr(show, 'venue_image_link', show.venue.image_link)
-    data.past_shows_count = len(data.past_shows)
-    data.upcoming_shows_count = len(data.upcoming_shows)
-
-    return render_template('pages/show_artist.html', artist=data)
+    def render():
+        data = artist_detail(artist_id)
+        if data is None:
+            abort(404)
+        return render_template('pages/show_artist.html', artist=data)
+
+    return cached(f'show_artist:{artist_id}', [f'artist:{artist_id}'], render)
+
+
+@app.route('/artists/<int:artist_id>/shows.json')
+def artist_schedule(artist_id):
+    # JSON feed of the artist's shows; see feeds.py.
+    return artist_json(artist_id)
+
+
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    try:
+        if delete_entity(Artist, artist_id):
+            flash(f"Artist with id= {artist_id} has been successfully deleted.")
+        else:
+            flash(f"Unable to delete artist {artist_id}.")
+    except:
+        db.session.rollback()
+        flash(f"Unable to delete artist {artist_id}.")
+    finally:
+        db.session.close()
+    return redirect(url_for('artists'))
 
 
 #  Update
@@ -336,7 +262,11 @@ def show_artist(artist_id):
 def edit_artist(artist_id):
     form = ArtistForm()
     artist = Artist.query.get(artist_id)
-    artist.genres = artist.genres.split(", ")
+    if artist is None or artist.deleted_at is not None:
+        abort(404)
+    # The form wants the genre names; detach the instance so they are never flushed.
+    db.session.expunge(artist)
+    artist.genres = genre_names(artist.genre_mask)
     # DONE: populate form with fields from artist with ID <artist_id>
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
@@ -347,19 +277,22 @@ def edit_artist_submission(artist_id):
     # artist record with ID <artist_id> using the new attributes
     try:
         artist = Artist.query.get(artist_id)
-        if not artist:
+        if not artist or artist.deleted_at is not None:
             abort(404)
         artist.name = request.form['name']
         artist.city = request.form['city']
         artist.state = request.form['state']
         artist.phone = request.form['phone']
-        artist.genres = ", ".join(request.form.getlist('genres'))
+        set_genres(artist, request.form.getlist('genres'))
         artist.facebook_link = request.form['facebook_link']
         artist.image_link = request.form['image_link']
         artist.website = request.form['website']
         artist.seeking_venue = request.form['seeking_venue'] == 'True'
         artist.seeking_description = request.form['seeking_description']
+        entities = artist_entities(artist_id)
+        touch_schedules(Artist, artist_id)
         db.session.commit()
+        bump(*entities)
         flash('Success!')
     except:
         db.session.rollback()
@@ -374,7 +307,11 @@ def edit_artist_submission(artist_id):
 def edit_venue(venue_id):
     form = VenueForm()
     venue = Venue.query.get(venue_id)
-    venue.genres = venue.genres.split(", ")
+    if venue is None or venue.deleted_at is not None:
+        abort(404)
+    # The form wants the genre names; detach the instance so they are never flushed.
+    db.session.expunge(venue)
+    venue.genres = genre_names(venue.genre_mask)
     # DONE: populate form with values from venue with ID <venue_id>
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
@@ -385,21 +322,24 @@ def edit_venue_submission(venue_id):
     # venue record with ID <venue_id> using the new attributes
     try:
         venue = Venue.query.get(venue_id)
-        if not venue:
+        if not venue or venue.deleted_at is not None:
             return abort(404)
         venue.name = request.form['name']
         venue.city = request.form['city']
         venue.state = request.form['state']
         venue.address = request.form['address']
         venue.phone = request.form['phone']
-        venue.genres = ", ".join(request.form.getlist('genres'))
+        set_genres(venue, request.form.getlist('genres'))
         venue.facebook_link = request.form['facebook_link']
         venue.image_link = request.form['image_link']
         venue.website = request.form['website']
         venue.seeking_talent = request.form['seeking_talent'] == 'True'
         venue.seeking_description = request.form['seeking_description']
         print(venue)
+        entities = venue_entities(venue_id)
+        touch_schedules(Venue, venue_id)
         db.session.commit()
+        bump(*entities)
         flash('Success!')
     except:
         db.session.rollback()
@@ -426,12 +366,13 @@ def create_artist_submission():
     try:
         artist = Artist(name=request.form.get('name'), city=request.form.get('city'), state=request.form.get('state'),
                         phone=request.form.get('phone'), facebook_link=request.form.get('facebook_link'),
-                        genres=", ".join(request.form.getlist('genres')), website=request.form.get('website'),
-                        image_link=request.form.get('image_link'),
+                        website=request.form.get('website'), image_link=request.form.get('image_link'),
                         seeking_venue=request.form.get('seeking_venue') == 'True',
                         seeking_description=request.form.get('seeking_description'))
+        set_genres(artist, request.form.getlist('genres'))
         db.session.add(artist)
         db.session.commit()
+        bump('artists')
         # on successful db insert, flash success
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except e:
@@ -453,13 +394,24 @@ def shows():
     # displays list of shows at /shows
     # DONE: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    all_shows = Show.query.all()
+    # /shows?from=2020-05-01&to=2020-06-01&upcoming=True&cursor=...&limit=50
+    # /shows?stream=True streams every matching show instead of one page.
+    filters = {
+        'start': request.args.get('from', type=dateutil.parser.parse),
+        'end': request.args.get('to', type=dateutil.parser.parse),
+        'upcoming_only': request.args.get('upcoming') == 'True'
+    }
+    if request.args.get('stream') == 'True':
+        return stream_template('pages/shows.html', shows=iter_shows(**filters))
+
+    limit = min(max(request.args.get('limit', SHOWS_PER_PAGE, type=int), 1), SHOWS_STREAM_BATCH)
+    try:
+        data, next_cursor = show_page(request.args.get('cursor'), limit, **filters)
+    except ValueError:
+        abort(400)
+    next_url = url_for('shows', **dict(request.args.to_dict(), cursor=next_cursor)) if next_cursor else None
 
-    for show in all_shows:
-        setattr(show, 'artist_name', show.artist.name)
-        setattr(show, 'artist_image_link', show.artist.image_link)
-        setattr(show, 'venue_name', show.venue.name)
-    return render_template('pages/shows.html', shows=all_shows)
+    return render_template('pages/shows.html', shows=data, next_url=next_url)
 
 
 @app.route('/shows/create')
@@ -478,11 +430,21 @@ def create_show_submission():
         flash(form.errors)
         return redirect(url_for('create_shows'))
 
+    venue_id, artist_id, start_time = form.venue_id.data, form.artist_id.data, form.start_time.data
     try:
-        new_show = Show(artist_id=request.form.get('artist_id'), venue_id=request.form.get('venue_id'),
-                        start_time=request.form.get('start_time'))
+        if not lock_booking(venue_id, artist_id):
+            flash('There is no such venue or artist.')
+            return redirect(url_for('create_shows'))
+        conflicts = find_conflicts(venue_id, artist_id, start_time)
+        if conflicts:
+            flash(f"The {conflicts[0]['conflict']} already has a show at "
+                  f"{format_datetime(conflicts[0]['start_time'])}. Show could not be listed.")
+            return redirect(url_for('create_shows'))
+        new_show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
         db.session.add(new_show)
+        record_show(new_show)
         db.session.commit()
+        bump(f'venue:{venue_id}', f'artist:{artist_id}', 'venues')
         # on successful db insert, flash success
         flash('Show was successfully listed!')
     except:
@@ -497,6 +459,31 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
+@app.route('/shows/check', methods=['POST'])
+def check_shows():
+    # Tour planning: POST {"shows": [{"venue_id": 1, "artist_id": 4,
+    # "start_time": "2026-05-21T21:30:00"}, ...]} (up to BOOKING_CHECK_LIMIT) and
+    # get back, for each proposed show, the booked or earlier proposed shows it
+    # overlaps. Nothing is written.
+    try:
+        proposals = [{
+            'venue_id': int(show['venue_id']),
+            'artist_id': int(show['artist_id']),
+            'start_time': local_time(dateutil.parser.parse(show['start_time']))
+        } for show in request.get_json()['shows']]
+    except (KeyError, TypeError, ValueError, OverflowError):
+        abort(400)
+    if len(proposals) > BOOKING_CHECK_LIMIT:
+        abort(413)
+
+    results = []
+    for proposal, conflicts in zip(proposals, check_bookings(proposals)):
+        for conflict in conflicts:
+            conflict['start_time'] = conflict['start_time'].isoformat()
+        results.append(dict(proposal, start_time=proposal['start_time'].isoformat(), conflicts=conflicts))
+    return jsonify({'shows': results, 'conflicts': sum(1 for result in results if result['conflicts'])})
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
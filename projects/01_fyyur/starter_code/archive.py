@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import click
+
+from cli import fyyur_cli
+from models import db, Show, ShowArchive
+
+ARCHIVE_AFTER_DAYS = 30
+# Postgres: monthly Show partitions are kept this many months ahead. Shows
+# booked further out land in Show_default; when their month's partition is
+# created, create_partitions() moves them into it.
+PARTITION_MONTHS_AHEAD = 3
+
+
+# ----------------------------------------------------------------------------#
+# Show archive.
+# ----------------------------------------------------------------------------#
+
+# Upcoming-show queries should only touch recent rows. On Postgres the Show
+# table is range-partitioned by month on start_time (see migration
+# 2b9e4c61d0f7), so `start_time > now` prunes to the current and future
+# partitions. Elsewhere, `flask fyyur archive-shows` moves shows that started
+# more than ARCHIVE_AFTER_DAYS ago into ShowArchive every night. Code that needs
+# past shows reads through all_shows(), which is the Show model on Postgres and
+# Show aliased over Show UNION ALL ShowArchive otherwise.
+
+def partitioned():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def all_shows():
+    # Returns an entity with Show's columns covering live and archived shows.
+    if partitioned():
+        return Show
+    archived = db.select(*[ShowArchive.__table__.c[column.key] for column in Show.__table__.columns])
+    shows = db.union_all(db.select(Show.__table__), archived).subquery('all_shows')
+    return db.aliased(Show, shows)
+
+
+def archive_shows(now=None, after_days=ARCHIVE_AFTER_DAYS):
+    # Moves shows that started more than after_days ago from Show to ShowArchive.
+    # They already count as past shows, so the counters do not change.
+    cutoff = (now or datetime.now()) - timedelta(days=after_days)
+    due = db.and_(db.not_(Show.is_upcoming), Show.start_time < cutoff)
+    columns = [column.key for column in Show.__table__.columns]
+    db.session.execute(ShowArchive.__table__.insert().from_select(
+        columns, db.select(Show.__table__).where(due)))
+    moved = db.session.query(Show).filter(due).delete(synchronize_session=False)
+    db.session.commit()
+    return moved
+
+
+def _month(year, month):
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def _exists(name):
+    return db.session.execute(db.text('SELECT to_regclass(:name)'), {'name': f'"{name}"'}).scalar() is not None
+
+
+def create_partitions(now=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    # Makes sure Show has a partition for this month and the next months_ahead
+    # months. Postgres only. Postgres refuses to add a partition while the
+    # default partition holds rows in its range, so when shows were booked
+    # that far out the default partition is detached, the month's shows are
+    # moved into the new partition and it is attached again, all in the same
+    # transaction (new shows wait on the lock meanwhile).
+    now = now or datetime.now()
+    created = []
+    for offset in range(months_ahead + 1):
+        start, end = _month(now.year, now.month + offset), _month(now.year, now.month + offset + 1)
+        name = f'Show_{start:%Y_%m}'
+        if _exists(name):
+            continue
+        in_range = f"start_time >= '{start:%Y-%m-%d}' AND start_time < '{end:%Y-%m-%d}'"
+        stranded = _exists('Show_default') and db.session.execute(db.text(
+            f'SELECT EXISTS (SELECT 1 FROM "Show_default" WHERE {in_range})')).scalar()
+        if stranded:
+            db.session.execute(db.text('ALTER TABLE "Show" DETACH PARTITION "Show_default"'))
+        db.session.execute(db.text(
+            f'CREATE TABLE "{name}" PARTITION OF "Show" '
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"))
+        if stranded:
+            db.session.execute(db.text(
+                'INSERT INTO "Show" (id, venue_id, artist_id, start_time, is_upcoming) '
+                f'SELECT id, venue_id, artist_id, start_time, is_upcoming FROM "Show_default" WHERE {in_range}'))
+            db.session.execute(db.text(f'DELETE FROM "Show_default" WHERE {in_range}'))
+            db.session.execute(db.text('ALTER TABLE "Show" ATTACH PARTITION "Show_default" DEFAULT'))
+        created.append(name)
+    db.session.commit()
+    return created
+
+
+@fyyur_cli.command('archive-shows')
+@click.option('--after-days', default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive shows that started more than this many days ago.')
+def archive_shows_command(after_days):
+    """Archive old shows (or add upcoming Show partitions on Postgres). Run nightly."""
+    if partitioned():
+        created = create_partitions()
+        click.echo(f"Created partitions: {', '.join(created)}." if created else 'Partitions are up to date.')
+    else:
+        click.echo(f'Archived {archive_shows(after_days=after_days)} shows.')
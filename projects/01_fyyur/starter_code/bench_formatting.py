@@ -0,0 +1,54 @@
+# Micro-benchmark for the datetime Jinja filter.
+#
+#   python bench_formatting.py [count]
+#
+# Compares the original per-call filter with formatting.format_datetime and
+# formatting.format_datetimes on the same timestamps, as datetimes and as strings.
+
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from formatting import format_datetime, format_datetimes
+
+
+def legacy_format_datetime(value, format='medium'):
+    # The filter as it was in app.py.
+    date = value
+    if type(value) != datetime:
+        date = dateutil.parser.parse(value)
+
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main(count=10000):
+    start = datetime(2020, 5, 21, 21, 30)
+    # Shows cluster on a limited set of slots, like real listings.
+    values = [start + timedelta(hours=i % 500) for i in range(count)]
+    strings = [value.isoformat() for value in values]
+
+    assert [legacy_format_datetime(v, 'full') for v in values[:100]] == format_datetimes(values[:100], 'full')
+
+    cases = [
+        ('legacy filter, datetimes', lambda: [legacy_format_datetime(v, 'full') for v in values]),
+        ('format_datetime, datetimes', lambda: [format_datetime(v, 'full') for v in values]),
+        ('format_datetimes, datetimes', lambda: format_datetimes(values, 'full')),
+        ('legacy filter, strings', lambda: [legacy_format_datetime(v, 'full') for v in strings]),
+        ('format_datetime, strings', lambda: [format_datetime(v, 'full') for v in strings]),
+        ('format_datetimes, strings', lambda: format_datetimes(strings, 'full')),
+    ]
+    print(f'{count} timestamps, best of 5')
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=5))
+        print(f'  {name:<30} {best * 1000:8.1f} ms  {best / count * 1e6:6.2f} us/value')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
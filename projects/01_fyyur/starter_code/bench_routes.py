@@ -0,0 +1,241 @@
+# Route benchmark.
+#
+#   DATABASE_URL=sqlite:///bench.db flask fyyur generate --seed 1
+#   DATABASE_URL=sqlite:///bench.db python bench_routes.py --output bench.json
+#   DATABASE_URL=sqlite:///bench.db python bench_routes.py --compare bench.json
+#
+# Sends --requests requests to every route in app.py, in-process through the
+# WSGI test client or over HTTP to a running server (--url), and reports
+# throughput and p50/p95/p99 latency per route. Ids are sampled from the
+# database the app is configured with, so point DATABASE_URL at the same
+# database the server uses. --output saves the results as JSON together with
+# the commit and data set size; --compare prints the change against such a file.
+# delete_venue, delete_artist and the /admin endpoints are never benchmarked.
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app import app
+from generator import WORDS
+from genres import GENRE_IDS
+from models import db, Venue, Artist, Show, live
+
+
+def _routes(rng, venue_ids, artist_ids, writes):
+    # (endpoint, method, callable returning (path, form data[, JSON body])) for every route.
+    def venue():
+        return rng.choice(venue_ids)
+
+    def artist():
+        return rng.choice(artist_ids)
+
+    def genre():
+        return rng.choice(list(GENRE_IDS))
+
+    def show():
+        start_time = datetime.now() + timedelta(days=rng.randint(1, 90), hours=rng.randint(0, 23))
+        return {'venue_id': venue(), 'artist_id': artist(), 'start_time': start_time.isoformat(' ', 'seconds')}
+
+    routes = [
+        ('index', 'GET', lambda: ('/', None)),
+        ('venues', 'GET', lambda: ('/venues', None)),
+        ('search_venues', 'POST', lambda: ('/venues/search', {'search_term': rng.choice(WORDS)})),
+        ('browse_venues', 'GET', lambda: (f'/venues/browse?genre={genre()}', None)),
+        ('show_venue', 'GET', lambda: (f'/venues/{venue()}', None)),
+        ('venue_schedule', 'GET', lambda: (f'/venues/{venue()}/shows.ics', None)),
+        ('create_venue_form', 'GET', lambda: ('/venues/create', None)),
+        ('edit_venue', 'GET', lambda: (f'/venues/{venue()}/edit', None)),
+        ('artists', 'GET', lambda: ('/artists', None)),
+        ('search_artists', 'POST', lambda: ('/artists/search', {'search_term': rng.choice(WORDS)})),
+        ('browse_artists', 'GET', lambda: (f'/artists/browse?genre={genre()}', None)),
+        ('show_artist', 'GET', lambda: (f'/artists/{artist()}', None)),
+        ('artist_schedule', 'GET', lambda: (f'/artists/{artist()}/shows.json', None)),
+        ('create_artist_form', 'GET', lambda: ('/artists/create', None)),
+        ('edit_artist', 'GET', lambda: (f'/artists/{artist()}/edit', None)),
+        ('shows', 'GET', lambda: ('/shows', None)),
+        ('shows_upcoming', 'GET', lambda: ('/shows?upcoming=True', None)),
+        ('create_shows', 'GET', lambda: ('/shows/create', None)),
+        ('api_v1.venues', 'GET', lambda: ('/api/v1/venues', None)),
+        ('api_v1.trending', 'GET', lambda: ('/api/v1/venues/trending', None)),
+        ('api_v1.venue', 'GET', lambda: (f'/api/v1/venues/{venue()}', None)),
+        ('api_v1.artists', 'GET', lambda: ('/api/v1/artists', None)),
+        ('api_v1.artist', 'GET', lambda: (f'/api/v1/artists/{artist()}', None)),
+        ('api_v1.shows', 'GET', lambda: ('/api/v1/shows', None)),
+        ('check_shows', 'POST', lambda: ('/shows/check', None, {'shows': [show() for _ in range(50)]})),
+    ]
+    if not writes:
+        return routes
+
+    def venue_form():
+        return {'name': f'Bench Venue {rng.random()}', 'city': 'Austin', 'state': 'TX', 'address': '1 Bench St',
+                'phone': '512-555-0100', 'genres': genre(), 'facebook_link': 'https://www.facebook.com/bench',
+                'image_link': 'https://example.com/bench.png', 'website': 'https://example.com',
+                'seeking_talent': 'False', 'seeking_description': ''}
+
+    def artist_form():
+        return {'name': f'Bench Artist {rng.random()}', 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0100',
+                'genres': genre(), 'facebook_link': 'https://www.facebook.com/bench',
+                'image_link': 'https://example.com/bench.png', 'website': 'https://example.com',
+                'seeking_venue': 'False', 'seeking_description': ''}
+
+    return routes + [
+        ('create_venue_submission', 'POST', lambda: ('/venues/create', venue_form())),
+        ('edit_venue_submission', 'POST', lambda: (f'/venues/{venue()}/edit', venue_form())),
+        ('create_artist_submission', 'POST', lambda: ('/artists/create', artist_form())),
+        ('edit_artist_submission', 'POST', lambda: (f'/artists/{artist()}/edit', artist_form())),
+        ('create_show_submission', 'POST', lambda: ('/shows/create', show())),
+    ]
+
+
+def _test_client_sender(cold):
+    client = app.test_client()
+
+    def send(method, path, data, body=None):
+        if cold:
+            app.extensions['page_cache'].clear()
+        return client.open(path, method=method, data=data, json=body).status_code
+
+    return send
+
+
+def _http_sender(url):
+    def send(method, path, data, body=None):
+        headers = {}
+        if body is not None:
+            body, headers['Content-Type'] = json.dumps(body).encode(), 'application/json'
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(url.rstrip('/') + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    return send
+
+
+def _percentile(cuts, percent):
+    return round(cuts[percent - 1] * 1000, 2)
+
+
+def _measure(send, method, make_request, requests, concurrency):
+    def timed(_):
+        request = make_request()
+        started = time.perf_counter()
+        status = send(method, *request)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(timed, range(requests)))
+    else:
+        results = [timed(i) for i in range(requests)]
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for seconds, _ in results]
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': requests,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'rps': round(requests / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'p50_ms': _percentile(cuts, 50),
+        'p95_ms': _percentile(cuts, 95),
+        'p99_ms': _percentile(cuts, 99),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(requests=100, url=None, concurrency=1, cold=False, writes=False, seed=0, echo=print):
+    # Returns the report that main() saves as JSON.
+    if writes and url:
+        raise ValueError('--writes only works in-process, where CSRF checks can be turned off.')
+    rng = random.Random(seed)
+    with app.app_context():
+        venue_ids = [venue_id for venue_id, in db.session.query(Venue.id).filter(live(Venue))]
+        artist_ids = [artist_id for artist_id, in db.session.query(Artist.id).filter(live(Artist))]
+        dataset = {'venues': len(venue_ids), 'artists': len(artist_ids), 'shows': Show.query.count()}
+        database = db.engine.dialect.name
+    if not venue_ids or not artist_ids:
+        raise ValueError('The database is empty; run `flask fyyur generate` first.')
+
+    csrf = app.config.get('WTF_CSRF_ENABLED', True)
+    app.config['WTF_CSRF_ENABLED'] = False
+    send = _http_sender(url) if url else _test_client_sender(cold)
+    results = {}
+    try:
+        for endpoint, method, make_request in _routes(rng, venue_ids, artist_ids, writes):
+            results[endpoint] = _measure(send, method, make_request, requests, concurrency)
+            echo(f"  {endpoint:<26} {results[endpoint]['rps']:8.1f} req/s  p50 {results[endpoint]['p50_ms']:8.2f} ms  "
+                 f"p95 {results[endpoint]['p95_ms']:8.2f} ms  p99 {results[endpoint]['p99_ms']:8.2f} ms"
+                 + (f"  {results[endpoint]['errors']} errors" if results[endpoint]['errors'] else ''))
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = csrf
+
+    return {
+        'commit': _commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'target': url or 'test client',
+        'database': database,
+        'dataset': dataset,
+        'concurrency': concurrency,
+        'cold_cache': cold,
+        'routes': results,
+    }
+
+
+def compare(previous, current, echo=print):
+    echo(f"Against {previous.get('commit') or 'unknown commit'} ({previous['created']}):")
+    for endpoint, result in current['routes'].items():
+        before = previous['routes'].get(endpoint)
+        if before is None:
+            continue
+        changes = [f"{key} {(result[key] - before[key]) / before[key] * 100:+6.1f}%"
+                   for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms') if before[key]]
+        echo(f"  {endpoint:<26} {'  '.join(changes)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every Fyyur route.')
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--url', help='benchmark a running server instead of the test client')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--cold', action='store_true', help='clear the page cache before every request')
+    parser.add_argument('--writes', action='store_true', help='also benchmark the create and edit submissions')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='compare with the results in this JSON file')
+    args = parser.parse_args(argv)
+
+    print(f"{args.requests} requests per route against {args.url or 'the test client'}")
+    report = benchmark(args.requests, args.url, args.concurrency, args.cold, args.writes, args.seed)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+
+from models import db, Venue, Artist, Show, ShowArchive, live, live_shows
+
+SHOW_DURATION = timedelta(hours=2)
+BOOKING_CHECK_LIMIT = 1000
+
+
+# ----------------------------------------------------------------------------#
+# Booking conflicts.
+# ----------------------------------------------------------------------------#
+
+# Every show is booked for SHOW_DURATION from its start_time, so two shows
+# overlap exactly when their start times are less than SHOW_DURATION apart. That
+# turns the interval search into a range search on start_time: one probe of
+# ix_Show_venue_id_start_time and one of ix_Show_artist_id_start_time (and their
+# ShowArchive twins) per proposed show, O(log n) however many shows the venue
+# has. check_bookings does the same for a batch with bisect over the sorted start
+# times of every venue and artist involved, loaded up front in four queries.
+# Shows of deleted venues and artists no longer block their slots, even before
+# the purge job has removed them.
+
+def local_time(start_time):
+    # Show.start_time holds naive local times; converts one with a UTC offset.
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone().replace(tzinfo=None)
+    return start_time
+
+
+def _window(start_time):
+    return start_time - SHOW_DURATION, start_time + SHOW_DURATION
+
+
+def _conflict(kind, start_time, show_id, venue_id, artist_id, proposal=None):
+    return {'conflict': kind, 'show_id': show_id, 'proposal': proposal, 'venue_id': venue_id,
+            'artist_id': artist_id, 'start_time': start_time}
+
+
+def find_conflicts(venue_id, artist_id, start_time):
+    # Returns the shows that overlap a show of this venue or artist at start_time.
+    # Lock the venue and artist rows first (lock_booking) to keep two requests
+    # from booking the same slot.
+    earliest, latest = _window(start_time)
+    probes = [
+        db.select(db.literal(kind).label('conflict'), model.start_time, model.id, model.venue_id,
+                  model.artist_id).where(key == entity_id, model.start_time > earliest, model.start_time < latest,
+                                         live_shows(model))
+        for model in (Show, ShowArchive)
+        for kind, key, entity_id in (('venue', model.venue_id, venue_id), ('artist', model.artist_id, artist_id))
+    ]
+    return [_conflict(*row) for row in sorted(db.session.execute(db.union_all(*probes)), key=lambda row: row[1:3])]
+
+
+def lock_booking(venue_id, artist_id):
+    # SELECT ... FOR UPDATE on the venue and artist. A no-op on SQLite, which
+    # serializes writers anyway. Returns False if either does not exist or was deleted.
+    venue = db.session.query(Venue.id).filter(Venue.id == venue_id, live(Venue)).with_for_update().first()
+    artist = db.session.query(Artist.id).filter(Artist.id == artist_id, live(Artist)).with_for_update().first()
+    return venue is not None and artist is not None
+
+
+def _booked(key, entity_ids, earliest, latest):
+    # {entity id: [(start_time, show id, venue id, artist id), ...]} sorted by
+    # start_time, for live and archived shows.
+    booked = defaultdict(list)
+    for model in (Show, ShowArchive):
+        query = db.session.query(model.start_time, model.id, model.venue_id, model.artist_id).filter(
+            getattr(model, key).in_(entity_ids), model.start_time > earliest, model.start_time < latest,
+            live_shows(model))
+        for show in query:
+            booked[getattr(show, key)].append(tuple(show))
+    for shows in booked.values():
+        shows.sort()
+    return booked
+
+
+def check_bookings(proposals):
+    # Takes a list of {'venue_id', 'artist_id', 'start_time'} dicts and returns,
+    # for each, the existing shows and the earlier proposals in the list that it
+    # overlaps, as if the earlier proposals had been booked.
+    if not proposals:
+        return []
+    earliest = _window(min(proposal['start_time'] for proposal in proposals))[0]
+    latest = _window(max(proposal['start_time'] for proposal in proposals))[1]
+    sides = [(kind, key, _booked(key, {proposal[key] for proposal in proposals}, earliest, latest))
+             for kind, key in (('venue', 'venue_id'), ('artist', 'artist_id'))]
+
+    results = []
+    for index, proposal in enumerate(proposals):
+        low, high = _window(proposal['start_time'])
+        found = []
+        for kind, key, booked in sides:
+            shows = booked[proposal[key]]
+            # Proposals go in with a negative id, -1 for the first one.
+            position = bisect_left(shows, (low, float('inf')))
+            while position < len(shows) and shows[position][0] < high:
+                start_time, show_id, venue_id, artist_id = shows[position]
+                if show_id > 0:
+                    found.append(_conflict(kind, start_time, show_id, venue_id, artist_id))
+                else:
+                    found.append(_conflict(kind, start_time, None, venue_id, artist_id, -show_id - 1))
+                position += 1
+            insort(shows, (proposal['start_time'], -index - 1, proposal['venue_id'], proposal['artist_id']))
+        results.append(found)
+    return results
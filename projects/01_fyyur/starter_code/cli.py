@@ -0,0 +1,4 @@
+from flask.cli import AppGroup
+
+# `flask fyyur ...` commands; see importer.py.
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
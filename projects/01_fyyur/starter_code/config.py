@@ -1,5 +1,6 @@
 import os
-SECRET_KEY = os.urandom(32)
+# Set SECRET_KEY when running several workers so they accept each other's session cookies.
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -10,5 +11,44 @@ DEBUG = True
 
 
 # DONE IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://tuncerm@localhost:5432/tuncerm'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://tuncerm@localhost:5432/tuncerm')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of every engine (see pooling.py). Each worker process can hold
+# DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW connections per database, which has
+# to stay under the server's max_connections across all workers.
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+# Seconds to wait for a free connection before giving up.
+DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+# Replace connections older than this many seconds, before the server or a proxy drops them.
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', 'true') == 'true'
+# Milliseconds; 0 means no limit.
+DATABASE_STATEMENT_TIMEOUT = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT', 0))
+# Set when DATABASE_URL points at PgBouncer in transaction pooling mode.
+DATABASE_PGBOUNCER = os.environ.get('DATABASE_PGBOUNCER', 'false') == 'true'
+
+# Read replicas, e.g. DATABASE_REPLICA_URLS=postgres://replica-1/fyyur,postgres://replica-2/fyyur
+# GET requests read from one of them; see routing.py.
+SQLALCHEMY_BINDS = {f'replica_{i}': url for i, url in
+                    enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))}
+READ_REPLICA_BINDS = list(SQLALCHEMY_BINDS)
+# How long a user's reads stay on the primary after they write.
+READ_YOUR_WRITES_SECONDS = 5
+
+# Rendered page cache (see page_cache.py): 'memory' keeps an LRU per worker, 'file'
+# shares entries between all workers on the host through PAGE_CACHE_DIR.
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', os.path.join(basedir, '.page_cache'))
+PAGE_CACHE_SIZE = 1024
+# Pages the 'file' backend keeps at most; older ones are swept.
+PAGE_CACHE_FILES = 10000
+# Upper bound on staleness from writes that bypass the app, and on pages that
+# move a show from upcoming to past between roll-overs.
+PAGE_CACHE_TTL = 300
+
+# Log a likely N+1 when one statement runs this many times in a request (see instrumentation.py).
+SQL_N_PLUS_ONE_THRESHOLD = 5
+# Required in the X-Admin-Token header for /admin/sql-stats; the endpoint is off when unset.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
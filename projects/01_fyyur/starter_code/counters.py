@@ -0,0 +1,139 @@
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from archive import all_shows
+from models import db, Venue, Artist, Show, live_shows
+from page_cache import bump_all
+from trending import forget_artist_trend, forget_venue_trend, rebuild_trends, record_trends, roll_trends
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming_shows_count / past_shows_count so listing pages
+# never have to aggregate the Show table. Writers keep them in step here, the
+# roll-over job moves started shows from upcoming to past, and reconcile rebuilds
+# everything from the Show table. Every counter change also stamps the entity's
+# schedule_updated_at, which the schedule feeds use for conditional requests.
+# The trending venue counts (trending.py) are kept in step alongside.
+
+def _bump(model, entity_id, upcoming=0, past=0):
+    values = {model.schedule_updated_at: datetime.now()}
+    if upcoming:
+        values[model.upcoming_shows_count] = model.upcoming_shows_count + upcoming
+    if past:
+        values[model.past_shows_count] = model.past_shows_count + past
+    if upcoming or past:
+        db.session.query(model).filter(model.id == entity_id).update(values, synchronize_session=False)
+
+
+def record_show(show, now=None):
+    # Counts a newly added show against its venue and artist. Call before committing.
+    now = now or datetime.now()
+    show.is_upcoming = show.start_time > now
+    upcoming, past = (1, 0) if show.is_upcoming else (0, 1)
+    _bump(Venue, show.venue_id, upcoming, past)
+    _bump(Artist, show.artist_id, upcoming, past)
+    record_trends([(show.venue_id, show.start_time)])
+
+
+def record_shows(shows, now=None):
+    # Bulk form of record_show for a list of Show column dicts: sets is_upcoming on
+    # each dict and issues one counter update per venue and artist.
+    now = now or datetime.now()
+    venues, artists = Counter(), Counter()
+    for show in shows:
+        show['is_upcoming'] = show['start_time'] > now
+        venues[show['venue_id'], show['is_upcoming']] += 1
+        artists[show['artist_id'], show['is_upcoming']] += 1
+    for model, counts in ((Venue, venues), (Artist, artists)):
+        for (entity_id, upcoming), count in counts.items():
+            if upcoming:
+                _bump(model, entity_id, upcoming=count)
+            else:
+                _bump(model, entity_id, past=count)
+    record_trends((show['venue_id'], show['start_time']) for show in shows)
+
+
+def forget_shows(model, entity_id):
+    # Takes a venue's or artist's shows off the counters of the other side and off
+    # the trending venues, before the shows are deleted. Shows whose other side
+    # was deleted first already came off when it was.
+    shows = all_shows()
+    own_key, counterpart, counterpart_key = (
+        (shows.venue_id, Artist, shows.artist_id) if model is Venue else (shows.artist_id, Venue, shows.venue_id))
+    rows = db.session.query(counterpart_key, shows.is_upcoming, db.func.count(shows.id)).filter(
+        own_key == entity_id, live_shows(shows, [counterpart])).group_by(counterpart_key, shows.is_upcoming).all()
+    for counterpart_id, is_upcoming, count in rows:
+        if is_upcoming:
+            _bump(counterpart, counterpart_id, upcoming=-count)
+        else:
+            _bump(counterpart, counterpart_id, past=-count)
+    if model is Venue:
+        forget_venue_trend(entity_id)
+    else:
+        forget_artist_trend(entity_id)
+
+
+def roll_over(now=None):
+    # Moves shows that have started since the last run from upcoming to past, and
+    # recounts the trending venues once the day has changed. Shows of deleted
+    # venues and artists are already off the counters and wait for the purge.
+    now = now or datetime.now()
+    if roll_trends(now):
+        db.session.commit()
+        bump_all()
+    due = db.session.query(Show.id, Show.venue_id, Show.artist_id).filter(
+        Show.is_upcoming, Show.start_time <= now, live_shows(Show)).with_for_update().all()
+    if not due:
+        return 0
+
+    for model, counts in ((Venue, Counter(show.venue_id for show in due)),
+                          (Artist, Counter(show.artist_id for show in due))):
+        for entity_id, count in counts.items():
+            _bump(model, entity_id, upcoming=-count, past=count)
+
+    db.session.query(Show).filter(Show.id.in_([show.id for show in due])).update(
+        {Show.is_upcoming: False}, synchronize_session=False)
+    db.session.commit()
+    bump_all()
+    return len(due)
+
+
+def reconcile(now=None):
+    # Rebuilds every counter from scratch, leaving out shows of deleted venues and artists.
+    now = now or datetime.now()
+    db.session.query(Show).update({Show.is_upcoming: Show.start_time > now}, synchronize_session=False)
+    shows = all_shows()
+    for model, foreign_key in ((Venue, shows.venue_id), (Artist, shows.artist_id)):
+        def count_shows(upcoming):
+            return db.select(db.func.count(shows.id)).where(
+                foreign_key == model.id, shows.is_upcoming == upcoming, live_shows(shows)).scalar_subquery()
+
+        db.session.query(model).update({
+            model.upcoming_shows_count: count_shows(True),
+            model.past_shows_count: count_shows(False)
+        }, synchronize_session=False)
+    rebuild_trends(now)
+    db.session.commit()
+    bump_all()
+
+
+counters_cli = AppGroup('counters', help='Maintain the venue and artist show counters.')
+
+
+@counters_cli.command('roll-over')
+def roll_over_command():
+    """Move started shows from upcoming to past. Run it from cron, e.g. every 5 minutes."""
+    click.echo(f'Rolled over {roll_over()} shows.')
+
+
+@counters_cli.command('reconcile')
+def reconcile_command():
+    """Rebuild all show counters from the Show table."""
+    reconcile()
+    click.echo('Show counters reconciled.')
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import click
+
+from cli import fyyur_cli
+from counters import forget_shows
+from feeds import touch_schedules
+from models import db, Venue, Artist, Show, ShowArchive, VenueTrend, venuegenres, artistgenres, live
+from page_cache import artist_entities, bump, venue_entities
+
+DELETE_BATCH_SIZE = 1000
+
+
+# ----------------------------------------------------------------------------#
+# Deleting venues and artists.
+# ----------------------------------------------------------------------------#
+
+# Deleting is two steps. soft_delete() sets deleted_at, which hides the venue or
+# artist everywhere (every read filters on models.live(), and the listing
+# indexes only cover live rows) and takes its shows off the counters, the
+# trending venues and the other side's feeds, all in one short transaction. purge()
+# then deletes its shows DELETE_BATCH_SIZE at a time, committing after each
+# batch so no transaction holds more than that many row locks, and finally the
+# row itself. delete_entity() purges small entities right away and leaves the
+# rest to `flask fyyur purge-deleted`, which runs from cron like archive-shows.
+
+def soft_delete(model, entity_id, now=None):
+    # Commits. Returns False if there is no live venue or artist with that id.
+    now = now or datetime.now()
+    entities = (venue_entities if model is Venue else artist_entities)(entity_id)
+    if not db.session.query(model).filter(model.id == entity_id, live(model)).update(
+            {model.deleted_at: now}, synchronize_session=False):
+        db.session.rollback()
+        return False
+    forget_shows(model, entity_id)
+    touch_schedules(model, entity_id, now)
+    db.session.commit()
+    bump(*entities)
+    return True
+
+
+def _key(model):
+    return 'venue_id' if model is Venue else 'artist_id'
+
+
+def _show_keys(model):
+    return [(table, getattr(table, _key(model))) for table in (Show, ShowArchive)]
+
+
+def _has_many_shows(model, entity_id, batch_size):
+    return sum(db.session.query(table.id).filter(column == entity_id).limit(batch_size + 1).count()
+               for table, column in _show_keys(model)) > batch_size
+
+
+def purge(model, entity_id, batch_size=DELETE_BATCH_SIZE):
+    # Deletes a soft-deleted venue or artist and its shows. Returns the number of shows deleted.
+    deleted = 0
+    for table, column in _show_keys(model):
+        while True:
+            batch = db.select(table.id).where(column == entity_id).limit(batch_size).scalar_subquery()
+            count = db.session.query(table).filter(table.id.in_(batch)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += count
+            if count < batch_size:
+                break
+
+    genres = venuegenres if model is Venue else artistgenres
+    db.session.execute(genres.delete().where(genres.c[_key(model)] == entity_id))
+    if model is Venue:
+        db.session.query(VenueTrend).filter(VenueTrend.venue_id == entity_id).delete(synchronize_session=False)
+    db.session.query(model).filter(model.id == entity_id, model.deleted_at.is_not(None)).delete(
+        synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def delete_entity(model, entity_id, batch_size=DELETE_BATCH_SIZE):
+    # Soft-deletes the venue or artist and purges it at once if that takes a
+    # single batch. Returns False if there was nothing to delete.
+    if not soft_delete(model, entity_id):
+        return False
+    if not _has_many_shows(model, entity_id, batch_size):
+        purge(model, entity_id, batch_size)
+    return True
+
+
+def purge_deleted(batch_size=DELETE_BATCH_SIZE):
+    # Purges every soft-deleted venue and artist. Returns (entities, shows) deleted.
+    entities = shows = 0
+    for model in (Venue, Artist):
+        for entity_id, in db.session.query(model.id).filter(model.deleted_at.is_not(None)).all():
+            shows += purge(model, entity_id, batch_size)
+            entities += 1
+    return entities, shows
+
+
+@fyyur_cli.command('purge-deleted')
+@click.option('--batch-size', default=DELETE_BATCH_SIZE, show_default=True,
+              help='Shows deleted per transaction.')
+def purge_deleted_command(batch_size):
+    """Delete the shows and rows of deleted venues and artists, in batches."""
+    entities, shows = purge_deleted(batch_size)
+    click.echo(f'Purged {entities} deleted venues and artists and {shows} shows.')
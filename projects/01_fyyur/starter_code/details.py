@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from archive import all_shows
+from genres import genre_values
+from models import db, Venue, Artist, live
+
+DETAIL_SHOWS_LIMIT = 20
+
+
+# ----------------------------------------------------------------------------#
+# Venue and artist detail pages.
+# ----------------------------------------------------------------------------#
+
+def _detail(model, entity_id, own_key, counterpart, counterpart_key, prefix, now, limit):
+    # Loads the entity, its shows and the counterpart's name and image in one
+    # statement. Shows are numbered per section (upcoming soonest first, past most
+    # recent first) so the optional limit is applied inside the database. Past
+    # shows may come from the archive.
+    now = now or datetime.now()
+    shows = all_shows()
+    own_key, counterpart_key = getattr(shows, own_key), getattr(shows, counterpart_key)
+    upcoming = shows.start_time > now
+    ranked = db.session.query(
+        own_key.label('owner_id'),
+        shows.start_time.label('start_time'),
+        counterpart.id.label('counterpart_id'),
+        counterpart.name.label('counterpart_name'),
+        counterpart.image_link.label('counterpart_image_link'),
+        db.func.row_number().over(
+            partition_by=upcoming,
+            order_by=(db.case((upcoming, shows.start_time)), shows.start_time.desc(), shows.id)
+        ).label('position')
+    ).join(counterpart, db.and_(counterpart.id == counterpart_key, live(counterpart))).filter(
+        own_key == entity_id).subquery()
+
+    join_on = ranked.c.owner_id == model.id
+    if limit is not None:
+        join_on = db.and_(join_on, ranked.c.position <= limit)
+    rows = db.session.query(
+        model, ranked.c.start_time, ranked.c.counterpart_id, ranked.c.counterpart_name,
+        ranked.c.counterpart_image_link
+    ).outerjoin(ranked, join_on).filter(model.id == entity_id, live(model)).order_by(ranked.c.start_time).all()
+    if not rows:
+        return None
+
+    entity = rows[0][0]
+    data = {column.key: getattr(entity, column.key) for column in model.__table__.columns}
+    data['genres'] = genre_values(entity.genre_mask)
+    data['past_shows'] = []
+    data['upcoming_shows'] = []
+    for _, start_time, counterpart_id, name, image_link in rows:
+        if start_time is None:
+            continue
+        show = {
+            'start_time': start_time,
+            f'{prefix}_id': counterpart_id,
+            f'{prefix}_name': name,
+            f'{prefix}_image_link': image_link
+        }
+        data['upcoming_shows' if start_time > now else 'past_shows'].append(show)
+    data['past_shows'].reverse()
+
+    return data
+
+
+def venue_detail(venue_id, now=None, limit=DETAIL_SHOWS_LIMIT):
+    return _detail(Venue, venue_id, 'venue_id', Artist, 'artist_id', 'artist', now, limit)
+
+
+def artist_detail(artist_id, now=None, limit=DETAIL_SHOWS_LIMIT):
+    return _detail(Artist, artist_id, 'artist_id', Venue, 'venue_id', 'venue', now, limit)
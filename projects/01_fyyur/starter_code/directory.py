@@ -0,0 +1,31 @@
+from itertools import groupby
+
+from models import db, Venue, live
+
+
+# ----------------------------------------------------------------------------#
+# Venue directory.
+# ----------------------------------------------------------------------------#
+
+def venue_directory():
+    # Builds the city/state -> venues -> upcoming show count tree for /venues
+    # from a single query over Venue, reading the maintained show counters.
+    rows = db.session.query(
+        Venue.city, Venue.state, Venue.id, Venue.name, Venue.upcoming_shows_count
+    ).filter(live(Venue)).order_by(
+        Venue.state, Venue.city, Venue.name, Venue.id
+    ).all()
+
+    areas = []
+    for (city, state), venues in groupby(rows, key=lambda row: (row[0], row[1])):
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue_id,
+                "name": name,
+                "num_upcoming_shows": num_upcoming_shows
+            } for _, _, venue_id, name, num_upcoming_shows in venues]
+        })
+
+    return areas
@@ -0,0 +1,139 @@
+import json
+from datetime import datetime, timezone
+
+from flask import Response, abort, request, stream_with_context
+from werkzeug.http import is_resource_modified
+
+from archive import all_shows
+from bookings import SHOW_DURATION
+from models import db, Venue, Artist, live
+
+FEED_BATCH_SIZE = 500
+
+
+# ----------------------------------------------------------------------------#
+# Schedule feeds.
+# ----------------------------------------------------------------------------#
+
+# /venues/<id>/shows.ics and /artists/<id>/shows.json let calendar clients sync
+# a schedule without scraping the detail pages. The entity's
+# schedule_updated_at gives the ETag and Last-Modified, so a client that polls
+# an unchanged schedule gets a 304 without a single show being read. Otherwise
+# the shows are streamed from a server-side cursor, FEED_BATCH_SIZE rows at a time.
+
+def touch_schedules(model, entity_id, now=None):
+    # Marks the schedules of an edited venue or artist, and of the other side of
+    # its shows (whose feeds show its name), as changed.
+    now = now or datetime.now()
+    shows = all_shows()
+    own_key, counterpart, counterpart_key = (
+        (shows.venue_id, Artist, shows.artist_id) if model is Venue else (shows.artist_id, Venue, shows.venue_id))
+    counterpart_ids = db.session.query(counterpart_key).filter(own_key == entity_id)
+    for target, condition in ((model, model.id == entity_id), (counterpart, counterpart.id.in_(counterpart_ids))):
+        db.session.query(target).filter(condition).update(
+            {target.schedule_updated_at: now}, synchronize_session=False)
+
+
+def _validators(model, entity_id):
+    # Returns (entity name, etag, last_modified), or aborts with 404. etag and
+    # last_modified are None for rows written before schedule_updated_at existed
+    # and never touched since (the column is only NOT NULL off SQLite).
+    row = db.session.query(model.name, model.schedule_updated_at).filter(model.id == entity_id, live(model)).first()
+    if row is None:
+        abort(404)
+    name, updated_at = row
+    if updated_at is None:
+        return name, None, None
+    # schedule_updated_at is naive local time.
+    last_modified = updated_at.astimezone(timezone.utc)
+    etag = f'{model.__tablename__.lower()}-{entity_id}-{updated_at.timestamp():.6f}'
+    return name, etag, last_modified
+
+
+def _schedule(model, entity_id):
+    # Yields (show id, start_time, venue name, address, city, state, artist name)
+    # rows in start_time order.
+    shows = all_shows()
+    own_key = shows.venue_id if model is Venue else shows.artist_id
+    query = db.select(
+        shows.id, shows.start_time, Venue.id, Venue.name, Venue.address, Venue.city, Venue.state,
+        Artist.id, Artist.name
+    ).join(Venue, Venue.id == shows.venue_id).join(Artist, Artist.id == shows.artist_id).where(
+        own_key == entity_id, live(Venue), live(Artist)).order_by(shows.start_time, shows.id)
+    yield from db.session.execute(query.execution_options(yield_per=FEED_BATCH_SIZE))
+
+
+def _feed(model, entity_id, mimetype, render):
+    name, etag, last_modified = _validators(model, entity_id)
+    if etag is not None and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        response = Response(stream_with_context(render(name, last_modified)), mimetype=mimetype)
+    if etag is not None:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def _ics_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_line(line):
+    # Folds content lines longer than 75 octets, as RFC 5545 requires.
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # Do not split a UTF-8 sequence.
+        while size < len(encoded) and (encoded[size] & 0xC0) == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode())
+        encoded = encoded[size:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def venue_ics(venue_id):
+    def render(name, last_modified):
+        stamp = f'{last_modified or datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}'
+        yield ''.join(_ics_line(line) for line in [
+            'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Fyyur//Venue schedule//EN',
+            f'X-WR-CALNAME:{_ics_text(name)}'])
+        for show_id, start_time, _, venue_name, address, city, state, _, artist_name in _schedule(Venue, venue_id):
+            location = ', '.join(part for part in (venue_name, address, city, state) if part)
+            yield ''.join(_ics_line(line) for line in [
+                'BEGIN:VEVENT',
+                f'UID:show-{show_id}@fyyur',
+                f'DTSTAMP:{stamp}',
+                f'DTSTART:{start_time:%Y%m%dT%H%M%S}',
+                f'DTEND:{start_time + SHOW_DURATION:%Y%m%dT%H%M%S}',
+                f'SUMMARY:{_ics_text(artist_name)}',
+                f'LOCATION:{_ics_text(location)}',
+                'END:VEVENT'])
+        yield _ics_line('END:VCALENDAR')
+
+    return _feed(Venue, venue_id, 'text/calendar', render)
+
+
+def artist_json(artist_id):
+    def render(name, last_modified):
+        yield json.dumps({'artist_id': artist_id, 'artist_name': name,
+                          'updated_at': last_modified.isoformat() if last_modified else None})[:-1] + ', "shows": ['
+        separator = ''
+        for show_id, start_time, venue_id, venue_name, address, city, state, _, _ in _schedule(Artist, artist_id):
+            yield separator + json.dumps({
+                'id': show_id,
+                'start_time': start_time.isoformat(),
+                'venue_id': venue_id,
+                'venue_name': venue_name,
+                'venue_address': address,
+                'venue_city': city,
+                'venue_state': state
+            })
+            separator = ', '
+        yield ']}'
+
+    return _feed(Artist, artist_id, 'application/json', render)
@@ -0,0 +1,72 @@
+from datetime import datetime
+from functools import lru_cache
+
+import dateutil.parser
+from babel import Locale
+from babel.dates import UTC, format_datetime as babel_format_datetime, parse_pattern
+
+DEFAULT_LOCALE = 'en'
+
+# Named formats used by the templates, mapped to babel patterns.
+PATTERNS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+BABEL_FORMATS = ('long', 'short')
+
+
+# ----------------------------------------------------------------------------#
+# Datetime formatting.
+# ----------------------------------------------------------------------------#
+
+# The datetime filter runs once per timestamp on pages with thousands of shows.
+# Patterns and locales are compiled once per (format, locale), string inputs are
+# parsed once, and formatted values are served from an LRU cache since shows
+# cluster on the same few time slots.
+
+@lru_cache(maxsize=64)
+def compile_format(format='medium', locale=DEFAULT_LOCALE):
+    # Returns a callable that formats a datetime with the given named format or pattern.
+    # Naive datetimes are taken as UTC and aware ones are shown in UTC, as
+    # babel.dates.format_datetime does with tzinfo=UTC.
+    locale = Locale.parse(locale)
+    if format in BABEL_FORMATS:
+        return lambda value: babel_format_datetime(value, format, tzinfo=UTC, locale=locale)
+
+    pattern = parse_pattern(PATTERNS.get(format, format))
+
+    def apply(value):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=UTC)
+        else:
+            value = value.astimezone(UTC)
+        return pattern.apply(value, locale)
+
+    return apply
+
+
+@lru_cache(maxsize=4096)
+def parse_datetime(value):
+    return dateutil.parser.parse(value)
+
+
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else parse_datetime(value)
+
+
+@lru_cache(maxsize=16384)
+def format_datetime(value, format='medium', locale=DEFAULT_LOCALE):
+    return compile_format(format, locale)(_as_datetime(value))
+
+
+def format_datetimes(values, format='medium', locale=DEFAULT_LOCALE):
+    # Formats a whole column of datetimes (or datetime strings) with one pattern
+    # lookup, formatting each distinct value once.
+    apply = compile_format(format, locale)
+    formatted = {}
+    result = []
+    for value in values:
+        if value not in formatted:
+            formatted[value] = apply(_as_datetime(value))
+        result.append(formatted[value])
+    return result
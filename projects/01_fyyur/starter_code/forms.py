@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, IntegerField
 from wtforms.validators import DataRequired, AnyOf, URL, Regexp, ValidationError, Length, Optional
 
 
@@ -102,8 +102,8 @@ class States(Enum):
 
 
 class ShowForm(FlaskForm):
-    artist_id = StringField('artist_id')
-    venue_id = StringField('venue_id')
+    artist_id = IntegerField('artist_id', validators=[DataRequired()])
+    venue_id = IntegerField('venue_id', validators=[DataRequired()])
     start_time = DateTimeField('start_time', validators=[DataRequired()], default=datetime.today())
 
 
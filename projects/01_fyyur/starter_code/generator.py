@@ -0,0 +1,124 @@
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+
+import click
+
+from cli import fyyur_cli
+from counters import reconcile
+from genres import GENRE_IDS, genre_mask, genre_names
+from models import db, Venue, Artist, Show, venuegenres, artistgenres
+
+# (city, state), most popular first; picks are skewed towards the top of the list.
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Nashville', 'TN'), ('Austin', 'TX'),
+    ('San Francisco', 'CA'), ('Seattle', 'WA'), ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Boston', 'MA'),
+    ('Denver', 'CO'), ('Portland', 'OR'), ('Philadelphia', 'PA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+    ('Memphis', 'TN'), ('Miami', 'FL'), ('Kansas City', 'MO'), ('Baltimore', 'MD'), ('Salt Lake City', 'UT'),
+]
+WORDS = ['Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Rusty', 'Silver', 'Wild', 'Lucky', 'Neon', 'Hollow',
+         'Crimson', 'Broken', 'Little', 'Grand', 'Sunset', 'Iron', 'Paper', 'Copper', 'Howling']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Club', 'Stage', 'Bar', 'Theater', 'Garden', 'Cellar']
+ARTIST_NOUNS = ['Band', 'Collective', 'Trio', 'Orchestra', 'Kings', 'Sisters', 'Machines', 'Ghosts', 'Riders', 'Echo']
+GENERATE_BATCH_SIZE = 1000
+
+
+# ----------------------------------------------------------------------------#
+# Synthetic data.
+# ----------------------------------------------------------------------------#
+
+# `flask fyyur generate` fills the database with a realistic-looking data set for
+# benchmarks (see bench_routes.py). Cities and venue/artist popularity follow a
+# Zipf-like skew, a few genres dominate, and shows are spread over the past two
+# years and the next six months with evenings and weekends favoured.
+
+def _zipf_weights(count, skew=1.1):
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def _random_genres(rng, weights):
+    return genre_mask(rng.choices(list(GENRE_IDS), weights, k=rng.choice([1, 1, 2, 2, 3])))
+
+
+def _entities(rng, count, nouns, seeking_key, with_address):
+    city_weights = _zipf_weights(len(CITIES))
+    genre_weights = _zipf_weights(len(GENRE_IDS), skew=0.8)
+    for i in range(count):
+        city, state = rng.choices(CITIES, city_weights)[0]
+        mask = _random_genres(rng, genre_weights)
+        entity = {
+            'name': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(nouns)} {i}',
+            'city': city,
+            'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'genre_mask': mask,
+            'genres': ', '.join(genre_names(mask)),
+            'image_link': f'https://picsum.photos/seed/{nouns[0].lower()}{i}/300/300',
+            seeking_key: rng.random() < 0.3,
+        }
+        if with_address:
+            entity['address'] = f'{rng.randint(1, 9999)} {rng.choice(WORDS)} St'
+        yield entity
+
+
+def _insert(model, association, key, entities):
+    # Inserts the entities with their genre links and returns their ids.
+    ids = []
+    while True:
+        batch = list(islice(entities, GENERATE_BATCH_SIZE))
+        if not batch:
+            return ids
+        batch_ids = db.session.scalars(
+            db.insert(model).returning(model.id, sort_by_parameter_order=True), batch).all()
+        db.session.execute(association.insert(), [
+            {'genre_id': GENRE_IDS[name], key: entity_id}
+            for entity_id, entity in zip(batch_ids, batch) for name in genre_names(entity['genre_mask'])])
+        ids.extend(batch_ids)
+
+
+def _start_time(rng, now):
+    # Three quarters of the shows are in the past two years, the rest in the next six months.
+    days = -rng.uniform(0, 730) if rng.random() < 0.75 else rng.uniform(0, 182)
+    day = (now + timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    if day.weekday() < 4 and rng.random() < 0.4:
+        day += timedelta(days=4 - day.weekday())
+    return day + timedelta(hours=rng.choice([18, 19, 19, 20, 20, 20, 21, 21, 22]), minutes=rng.choice([0, 0, 30]))
+
+
+def generate(venues=1000, artists=2000, shows=50000, seed=None, now=None):
+    # Inserts venues, artists and shows, rebuilds the show counters and returns
+    # the number of rows of each.
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    venue_ids = _insert(Venue, venuegenres, 'venue_id',
+                        _entities(rng, venues, VENUE_NOUNS, 'seeking_talent', with_address=True))
+    artist_ids = _insert(Artist, artistgenres, 'artist_id',
+                         _entities(rng, artists, ARTIST_NOUNS, 'seeking_venue', with_address=False))
+
+    # Busy venues and touring artists get most of the shows.
+    venue_weights = _zipf_weights(len(venue_ids), skew=0.9)
+    artist_weights = _zipf_weights(len(artist_ids), skew=0.9)
+    for start in range(0, shows, GENERATE_BATCH_SIZE):
+        count = min(GENERATE_BATCH_SIZE, shows - start)
+        db.session.execute(Show.__table__.insert(), [{
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': _start_time(rng, now)
+        } for venue_id, artist_id in zip(rng.choices(venue_ids, venue_weights, k=count),
+                                         rng.choices(artist_ids, artist_weights, k=count))])
+    db.session.commit()
+    reconcile(now)
+    return {'venues': len(venue_ids), 'artists': len(artist_ids), 'shows': shows}
+
+
+@fyyur_cli.command('generate')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=2000, show_default=True)
+@click.option('--shows', default=50000, show_default=True)
+@click.option('--seed', type=int, help='Make the data set reproducible.')
+def generate_command(venues, artists, shows, seed):
+    """Fill the database with synthetic venues, artists and shows."""
+    started = datetime.now()
+    counts = generate(venues, artists, shows, seed)
+    click.echo(f"Generated {counts['venues']} venues, {counts['artists']} artists and {counts['shows']} shows "
+               f'in {(datetime.now() - started).total_seconds():.1f}s.')
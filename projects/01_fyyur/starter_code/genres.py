@@ -0,0 +1,119 @@
+import math
+from functools import lru_cache
+
+from sqlalchemy import event
+
+from forms import Genres
+from models import db, Genre, Venue, Artist, live
+
+BROWSE_RESULTS_PER_PAGE = 50
+
+
+# ----------------------------------------------------------------------------#
+# Genre storage.
+# ----------------------------------------------------------------------------#
+
+# Every Genres member has a fixed Genre row (id = position + 1) and one bit in
+# Venue/Artist.genre_mask. The association tables answer "which venues play
+# Jazz", the mask answers "does this venue play Jazz or Blues" without a join,
+# and decoding a mask for display is a cached lookup instead of a string split.
+
+GENRE_IDS = {genre.name: position + 1 for position, genre in enumerate(Genres)}
+GENRE_BITS = {name: 1 << (genre_id - 1) for name, genre_id in GENRE_IDS.items()}
+
+
+@event.listens_for(Genre.__table__, 'after_create')
+def seed_genres(target, connection, **kw):
+    connection.execute(target.insert(), [{'id': genre_id, 'name': name} for name, genre_id in GENRE_IDS.items()])
+
+
+def genre_mask(names):
+    mask = 0
+    for name in names:
+        mask |= GENRE_BITS[name]
+    return mask
+
+
+@lru_cache(maxsize=1024)
+def genre_names(mask):
+    return tuple(name for name, bit in GENRE_BITS.items() if mask & bit)
+
+
+@lru_cache(maxsize=1024)
+def genre_values(mask):
+    return tuple(Genres[name].value for name in genre_names(mask))
+
+
+def set_genres(entity, names):
+    # Writes the genre names to all three representations on a Venue or Artist.
+    mask = genre_mask(names)
+    entity.genre_mask = mask
+    entity.genres = ", ".join(genre_names(mask))
+    with db.session.no_autoflush:
+        entity.genre_list = Genre.query.filter(
+            Genre.id.in_([GENRE_IDS[name] for name in genre_names(mask)])).all() if mask else []
+
+
+# ----------------------------------------------------------------------------#
+# Genre browsing.
+# ----------------------------------------------------------------------------#
+
+SEEKING_COLUMNS = {Venue: 'seeking_talent', Artist: 'seeking_venue'}
+
+
+def has_genres(model, mask, match_all=False):
+    matched = model.genre_mask.op('&')(mask)
+    return matched == mask if match_all else matched != 0
+
+
+def genre_facets(query, model):
+    # Counts the rows of query per genre in a single aggregate over the masks.
+    counts = query.with_entities(*[
+        db.func.coalesce(db.func.sum(db.case((has_genres(model, bit), 1), else_=0)), 0)
+        for bit in GENRE_BITS.values()
+    ]).one()
+    return dict(zip(GENRE_BITS, counts))
+
+
+def browse(model, genres=(), city=None, state=None, seeking=False, match_all=False, page=1,
+           per_page=BROWSE_RESULTS_PER_PAGE):
+    # Lists venues or artists playing the given genres, e.g. venues in NY seeking Jazz.
+    query = db.session.query(model).filter(live(model))
+    if state:
+        query = query.filter(model.state == state)
+    if city:
+        query = query.filter(model.city == city)
+    if seeking:
+        query = query.filter(getattr(model, SEEKING_COLUMNS[model]).is_(True))
+
+    facets = genre_facets(query, model)
+    mask = genre_mask(name for name in genres if name in GENRE_BITS)
+    if mask:
+        query = query.filter(has_genres(model, mask, match_all))
+
+    page = max(page, 1)
+    rows = query.with_entities(
+        model.id, model.name, model.city, model.state, model.genre_mask, model.upcoming_shows_count,
+        db.func.count().over()
+    ).order_by(model.name, model.id).limit(per_page).offset((page - 1) * per_page).all()
+    count = rows[0][-1] if rows else (query.count() if page > 1 else 0)
+
+    return {
+        "count": count,
+        "page": page,
+        "pages": math.ceil(count / per_page),
+        "facets": [{
+            "name": name,
+            "value": Genres[name].value,
+            "count": facets[name],
+            "selected": bool(mask & bit)
+        } for name, bit in GENRE_BITS.items()],
+        "data": [{
+            "id": entity_id,
+            "name": name,
+            "city": city,
+            "state": state,
+            "genres": genre_values(entity_mask),
+            "num_upcoming_shows": num_upcoming_shows
+        } for entity_id, name, city, state, entity_mask, num_upcoming_shows, _ in rows]
+    }
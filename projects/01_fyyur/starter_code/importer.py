@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+import click
+from werkzeug.datastructures import MultiDict
+
+from cli import fyyur_cli
+from counters import record_shows
+from forms import VenueForm, ArtistForm, ShowForm
+from genres import GENRE_IDS, genre_mask, genre_names
+from models import db, Venue, Artist, Show, venuegenres, artistgenres, live
+from page_cache import bump_all
+
+IMPORT_BATCH_SIZE = 1000
+
+
+# ----------------------------------------------------------------------------#
+# Bulk import.
+# ----------------------------------------------------------------------------#
+
+# `flask fyyur import venues venues.csv` streams a CSV or NDJSON file, validates
+# each row with the same form the web UI uses and inserts valid rows in batches
+# of IMPORT_BATCH_SIZE, one transaction per batch. Rejected rows go to
+# <file>.rejects.ndjson and the number of rows handled so far to
+# <file>.checkpoint, so a failed import can be picked up with --resume.
+
+def read_rows(path, format=None):
+    # Yields row dicts from a CSV file with a header row or from an NDJSON file.
+    format = format or ('ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv')
+    with open(path, newline='') as file:
+        if format == 'csv':
+            for row in csv.DictReader(file):
+                yield {key: value for key, value in row.items() if value not in (None, '')}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _form_data(row):
+    data = MultiDict()
+    for key, value in row.items():
+        if key == 'genres':
+            names = value if isinstance(value, list) else value.replace(';', ',').split(',')
+            for name in names:
+                data.add(key, name.strip())
+        else:
+            data.add(key, str(value))
+    return data
+
+
+def _entity_values(model, form):
+    values = {key: value for key, value in form.data.items() if hasattr(model, key) and key != 'genres'}
+    for key in ('seeking_talent', 'seeking_venue'):
+        if key in values:
+            values[key] = values[key] == 'True'
+    mask = genre_mask(form.genres.data)
+    values['genre_mask'] = mask
+    values['genres'] = ", ".join(genre_names(mask))
+    return values
+
+
+def validate_row(form_class, row):
+    # Returns (form, errors) using the same validators as the web forms.
+    data = _form_data(row)
+    for key in ('seeking_talent', 'seeking_venue'):
+        if key in form_class.__dict__ and key not in data:
+            data[key] = 'False'
+    form = form_class(formdata=data, meta={'csrf': False})
+    try:
+        valid = form.validate()
+    except KeyError as e:
+        # check_multiple looks genres up by name.
+        return form, {'genres': [f'Unknown genre {e}']}
+    return form, ({} if valid else form.errors)
+
+
+def _insert_entities(model, association, key, rows):
+    values = [entity for _, _, entity in rows]
+    ids = db.session.scalars(
+        db.insert(model).returning(model.id, sort_by_parameter_order=True), values).all()
+    links = [{'genre_id': GENRE_IDS[name], key: entity_id}
+             for entity_id, entity in zip(ids, values) for name in genre_names(entity['genre_mask'])]
+    if links:
+        db.session.execute(association.insert(), links)
+
+
+def _copy_shows(shows):
+    # COPY is several times faster than executemany for plain rows on Postgres.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for show in shows:
+        writer.writerow([show['venue_id'], show['artist_id'], show['start_time'].isoformat(), show['is_upcoming']])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY "Show" (venue_id, artist_id, start_time, is_upcoming) FROM STDIN WITH CSV', buffer)
+
+
+def _show_values(form):
+    try:
+        return {'venue_id': int(form.venue_id.data), 'artist_id': int(form.artist_id.data),
+                'start_time': form.start_time.data}
+    except (TypeError, ValueError):
+        return None
+
+
+def _insert_shows(rows, rejects):
+    # Rejects shows whose venue or artist does not exist, then inserts the rest.
+    if not rows:
+        return 0
+    venue_ids = {show['venue_id'] for _, _, show in rows}
+    artist_ids = {show['artist_id'] for _, _, show in rows}
+    venue_ids = {row[0] for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids), live(Venue))}
+    artist_ids = {row[0] for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids), live(Artist))}
+    valid = []
+    for number, row, show in rows:
+        errors = {}
+        if show['venue_id'] not in venue_ids:
+            errors['venue_id'] = [f"Venue {show['venue_id']} does not exist"]
+        if show['artist_id'] not in artist_ids:
+            errors['artist_id'] = [f"Artist {show['artist_id']} does not exist"]
+        if errors:
+            rejects.add(number, row, errors)
+        else:
+            valid.append(show)
+    if not valid:
+        return 0
+
+    record_shows(valid)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        _copy_shows(valid)
+    else:
+        db.session.execute(Show.__table__.insert(), valid)
+    return len(valid)
+
+
+class Rejects:
+    # Collects a batch's rejected rows and appends them to the rejects file as
+    # NDJSON once the batch commits, so a retried batch is not reported twice.
+
+    def __init__(self, path, append):
+        self.file = open(path, 'a' if append else 'w')
+        self.count = 0
+        self.pending = []
+
+    def add(self, number, row, errors):
+        self.pending.append({'row_number': number, 'row': row, 'errors': errors})
+
+    def flush(self):
+        for reject in self.pending:
+            self.file.write(json.dumps(reject, default=str) + '\n')
+        self.count += len(self.pending)
+        self.pending = []
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+IMPORTERS = {
+    'venues': (VenueForm, Venue, venuegenres, 'venue_id'),
+    'artists': (ArtistForm, Artist, artistgenres, 'artist_id'),
+    'shows': (ShowForm, Show, None, None),
+}
+
+
+def import_file(kind, path, format=None, batch_size=IMPORT_BATCH_SIZE, resume=False, echo=lambda message: None):
+    # Imports path into kind ('venues', 'artists' or 'shows'). Returns (imported, rejected).
+    form_class, model, association, key = IMPORTERS[kind]
+    checkpoint_path = f'{path}.checkpoint'
+    checkpoint = {'rows': 0, 'imported': 0, 'rejected': 0}
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as file:
+            checkpoint = json.load(file)
+        echo(f"Resuming after row {checkpoint['rows']}.")
+
+    imported, rejected = checkpoint['imported'], checkpoint['rejected']
+    rejects = Rejects(f'{path}.rejects.ndjson', append=resume)
+    rows = islice(enumerate(read_rows(path, format), start=1), checkpoint['rows'], None)
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            valid = []
+            for number, row in batch:
+                form, errors = validate_row(form_class, row)
+                if errors:
+                    rejects.add(number, row, errors)
+                elif model is Show:
+                    show = _show_values(form)
+                    if show is None:
+                        rejects.add(number, row, {'venue_id': ['Not a valid id'], 'artist_id': ['Not a valid id']})
+                    else:
+                        valid.append((number, row, show))
+                else:
+                    valid.append((number, row, _entity_values(model, form)))
+
+            try:
+                if model is Show:
+                    imported += _insert_shows(valid, rejects)
+                elif valid:
+                    _insert_entities(model, association, key, valid)
+                    imported += len(valid)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            bump_all()
+            rejects.flush()
+
+            checkpoint = {'rows': batch[-1][0], 'imported': imported, 'rejected': rejected + rejects.count}
+            with open(checkpoint_path, 'w') as file:
+                json.dump(checkpoint, file)
+            echo(f"{checkpoint['rows']} rows read, {imported} imported, {checkpoint['rejected']} rejected.")
+    finally:
+        rejects.close()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return imported, rejected + rejects.count
+
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+@click.option('--resume', is_flag=True, help='Continue a failed import from its checkpoint.')
+def import_command(kind, path, format, batch_size, resume):
+    """Bulk import venues, artists or shows from a CSV or NDJSON file."""
+    started = datetime.now()
+    imported, rejected = import_file(kind, path, format, batch_size, resume, echo=click.echo)
+    click.echo(f'Imported {imported} {kind} in {(datetime.now() - started).total_seconds():.1f}s.')
+    if rejected:
+        click.echo(f'{rejected} rows rejected, see {path}.rejects.ndjson.')
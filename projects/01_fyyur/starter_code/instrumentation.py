@@ -0,0 +1,158 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import abort, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s|:\w+")
+_PLACEHOLDER_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+TOP_STATEMENTS = 10
+
+
+# ----------------------------------------------------------------------------#
+# SQL instrumentation.
+# ----------------------------------------------------------------------------#
+
+# Every statement run while handling a request is counted, timed and reduced to
+# a fingerprint (the statement with literals, placeholders and IN lists
+# collapsed). A fingerprint seen SQL_N_PLUS_ONE_THRESHOLD times in one request
+# is logged as a likely N+1. Responses carry a Server-Timing header, and the
+# per-route totals of this worker are served as JSON at /admin/sql-stats.
+
+def fingerprint(statement):
+    statement = _LITERALS.sub('?', statement)
+    statement = _PLACEHOLDER_LISTS.sub('(?)', statement)
+    return ' '.join(statement.split())
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.fingerprint_seconds = Counter()
+
+    def record(self, statement, seconds):
+        key = fingerprint(statement)
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[key] += 1
+        self.fingerprint_seconds[key] += seconds
+
+    def repeated(self, threshold):
+        return {key: count for key, count in self.fingerprints.items() if count >= threshold}
+
+
+class RouteStats:
+    # Per-endpoint totals, shared by the threads of one worker.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = defaultdict(lambda: {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_seconds': 0.0,
+            'n_plus_one_requests': 0, 'statements': Counter(), 'statement_seconds': Counter(),
+            'n_plus_one': Counter()
+        })
+
+    def record(self, endpoint, stats, repeated):
+        with self.lock:
+            route = self.routes[endpoint]
+            route['requests'] += 1
+            route['queries'] += stats.count
+            route['max_queries'] = max(route['max_queries'], stats.count)
+            route['sql_seconds'] += stats.seconds
+            route['statements'].update(stats.fingerprints)
+            route['statement_seconds'].update(stats.fingerprint_seconds)
+            if repeated:
+                route['n_plus_one_requests'] += 1
+                route['n_plus_one'].update(repeated.keys())
+
+    def snapshot(self):
+        with self.lock:
+            return {endpoint: {
+                'requests': route['requests'],
+                'queries': route['queries'],
+                'avg_queries': round(route['queries'] / route['requests'], 2),
+                'max_queries': route['max_queries'],
+                'sql_ms': round(route['sql_seconds'] * 1000, 2),
+                'avg_sql_ms': round(route['sql_seconds'] * 1000 / route['requests'], 2),
+                'n_plus_one_requests': route['n_plus_one_requests'],
+                'n_plus_one': [{'statement': key, 'requests': count}
+                               for key, count in route['n_plus_one'].most_common()],
+                'slowest_statements': [{
+                    'statement': key,
+                    'count': route['statements'][key],
+                    'ms': round(seconds * 1000, 2)
+                } for key, seconds in route['statement_seconds'].most_common(TOP_STATEMENTS)]
+            } for endpoint, route in self.routes.items()}
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context() and 'sql' in g:
+        g.sql.record(statement, seconds)
+
+
+def require_admin_token():
+    # Admin endpoints are hidden unless ADMIN_TOKEN is set, and then need it in
+    # the X-Admin-Token header.
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        abort(404)
+    if request.headers.get('X-Admin-Token') != token:
+        abort(403)
+
+
+def init_instrumentation(app):
+    app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+    app.config.setdefault('ADMIN_TOKEN', None)
+    app.extensions['sql_stats'] = route_stats = RouteStats()
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql = RequestStats()
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = g.get('sql')
+        if stats is not None:
+            total = time.perf_counter() - stats.started
+            response.headers.add('Server-Timing', f'sql;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", '
+                                                  f'app;dur={total * 1000:.1f}')
+        return response
+
+    @app.teardown_request
+    def record_sql_stats(exception=None):
+        # Runs after streamed responses finish, so their queries are included here
+        # even though the Server-Timing header went out before them.
+        stats = g.pop('sql', None)
+        if stats is None:
+            return
+        repeated = stats.repeated(app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+        for key, count in repeated.items():
+            app.logger.warning('Possible N+1 in %s: %d x %s', request.endpoint, count, key)
+        route_stats.record(request.endpoint or request.path, stats, repeated)
+
+    def sql_stats():
+        # GET returns the per-route totals, DELETE resets them.
+        require_admin_token()
+        if request.method == 'DELETE':
+            route_stats.clear()
+        return jsonify(route_stats.snapshot())
+
+    app.add_url_rule('/admin/sql-stats', 'sql_stats', sql_stats, methods=['GET', 'DELETE'])
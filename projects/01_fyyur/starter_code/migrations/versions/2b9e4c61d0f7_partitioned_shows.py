@@ -0,0 +1,135 @@
+"""partitioned shows
+
+Revision ID: 2b9e4c61d0f7
+Revises: 8fd881e8b332
+Create Date: 2020-05-06 22:41:37.604115
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b9e4c61d0f7'
+down_revision = '8fd881e8b332'
+branch_labels = None
+depends_on = None
+
+# Mirrors models.Show at the time of this revision.
+SHOW_INDEXES = [
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time'], {}),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time'], {}),
+    ('ix_Show_start_time_id', ['start_time', 'id'], {}),
+    ('ix_Show_upcoming_start_time', ['start_time'],
+     {'postgresql_where': sa.text('is_upcoming'), 'sqlite_where': sa.text('is_upcoming = 1')}),
+]
+# Shows booked further ahead go to Show_default until archive.create_partitions()
+# adds their month and moves them there.
+PARTITION_MONTHS_AHEAD = 3
+
+
+def _month(year, month):
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def _create_show_indexes():
+    for name, columns, where in SHOW_INDEXES:
+        op.create_index(name, 'Show', columns, **where)
+
+
+def _drop_show_indexes():
+    for name, _, _ in reversed(SHOW_INDEXES):
+        op.drop_index(name, table_name='Show')
+
+
+def _partition_shows():
+    # Rebuilds Show as a table range-partitioned by month on start_time. Everything
+    # before this month goes to Show_history; `flask fyyur archive-shows` keeps
+    # adding monthly partitions ahead of time.
+    _drop_show_indexes()
+    op.execute('ALTER TABLE "Show" RENAME TO "Show_unpartitioned"')
+    op.execute('ALTER TABLE "Show_unpartitioned" RENAME CONSTRAINT "Show_pkey" TO "Show_unpartitioned_pkey"')
+    # Partitioned tables need the partition key in the primary key.
+    op.execute('''
+        CREATE TABLE "Show" (
+            id integer NOT NULL DEFAULT nextval('"Show_id_seq"'::regclass),
+            venue_id integer NOT NULL REFERENCES "Venue" (id),
+            artist_id integer NOT NULL REFERENCES "Artist" (id),
+            start_time timestamp without time zone NOT NULL,
+            is_upcoming boolean NOT NULL DEFAULT false,
+            PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    ''')
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+
+    now = datetime.now()
+    this_month = _month(now.year, now.month)
+    op.execute(f'CREATE TABLE "Show_history" PARTITION OF "Show" '
+               f"FOR VALUES FROM (MINVALUE) TO ('{this_month:%Y-%m-%d}')")
+    for offset in range(PARTITION_MONTHS_AHEAD + 1):
+        start, end = _month(now.year, now.month + offset), _month(now.year, now.month + offset + 1)
+        op.execute(f'CREATE TABLE "Show_{start:%Y_%m}" PARTITION OF "Show" '
+                   f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')")
+    op.execute('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT')
+
+    op.execute('INSERT INTO "Show" (id, venue_id, artist_id, start_time, is_upcoming) '
+               'SELECT id, venue_id, artist_id, start_time, is_upcoming FROM "Show_unpartitioned"')
+    op.execute('DROP TABLE "Show_unpartitioned"')
+    _create_show_indexes()
+
+
+def _unpartition_shows():
+    _drop_show_indexes()
+    op.execute('ALTER TABLE "Show" RENAME TO "Show_partitioned"')
+    op.execute('ALTER TABLE "Show_partitioned" RENAME CONSTRAINT "Show_pkey" TO "Show_partitioned_pkey"')
+    op.execute('''
+        CREATE TABLE "Show" (
+            id integer NOT NULL DEFAULT nextval('"Show_id_seq"'::regclass) PRIMARY KEY,
+            venue_id integer NOT NULL REFERENCES "Venue" (id),
+            artist_id integer NOT NULL REFERENCES "Artist" (id),
+            start_time timestamp without time zone NOT NULL,
+            is_upcoming boolean NOT NULL DEFAULT false
+        )
+    ''')
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    op.execute('INSERT INTO "Show" (id, venue_id, artist_id, start_time, is_upcoming) '
+               'SELECT id, venue_id, artist_id, start_time, is_upcoming FROM "Show_partitioned"')
+    op.execute('DROP TABLE "Show_partitioned"')
+    _create_show_indexes()
+
+
+def upgrade():
+    op.create_table('ShowArchive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('is_upcoming', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ShowArchive_venue_id_start_time', 'ShowArchive', ['venue_id', 'start_time'])
+    op.create_index('ix_ShowArchive_artist_id_start_time', 'ShowArchive', ['artist_id', 'start_time'])
+    op.create_index('ix_ShowArchive_start_time_id', 'ShowArchive', ['start_time', 'id'])
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        _partition_shows()
+    elif dialect == 'sqlite':
+        # AUTOINCREMENT keeps SQLite from reusing the ids of archived shows.
+        _drop_show_indexes()
+        with op.batch_alter_table('Show', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        _create_show_indexes()
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        _unpartition_shows()
+    op.execute('INSERT INTO "Show" (id, venue_id, artist_id, start_time, is_upcoming) '
+               'SELECT id, venue_id, artist_id, start_time, is_upcoming FROM "ShowArchive"')
+    op.drop_table('ShowArchive')
@@ -0,0 +1,46 @@
+"""added show counters
+
+Revision ID: 4764fa16da96
+Revises: 6f05b9d08929
+Create Date: 2020-05-02 18:12:41.503117
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4764fa16da96'
+down_revision = '6f05b9d08929'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('Show', sa.Column('is_upcoming', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    # Backfill the counters from the existing shows.
+    show = sa.table('Show', sa.column('venue_id'), sa.column('artist_id'), sa.column('start_time'),
+                    sa.column('is_upcoming'))
+    op.execute(show.update().values(is_upcoming=show.c.start_time > datetime.now()))
+    for table, foreign_key in (('Venue', show.c.venue_id), ('Artist', show.c.artist_id)):
+        entity = sa.table(table, sa.column('id'), sa.column('upcoming_shows_count'), sa.column('past_shows_count'))
+
+        def count_shows(upcoming):
+            return sa.select(sa.func.count()).where(
+                foreign_key == entity.c.id, show.c.is_upcoming == upcoming).scalar_subquery()
+
+        op.execute(entity.update().values(upcoming_shows_count=count_shows(True),
+                                          past_shows_count=count_shows(False)))
+
+
+def downgrade():
+    op.drop_column('Show', 'is_upcoming')
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
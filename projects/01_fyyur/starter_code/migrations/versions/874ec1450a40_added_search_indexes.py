@@ -0,0 +1,56 @@
+"""added search indexes
+
+Revision ID: 874ec1450a40
+Revises: 4764fa16da96
+Create Date: 2020-05-03 11:47:09.218336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '874ec1450a40'
+down_revision = '4764fa16da96'
+branch_labels = None
+depends_on = None
+
+# Mirrors the DDL in search.py at the time of this revision.
+DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(genres, ''))"
+COLUMNS = 'name, city, genres'
+NEW_VALUES = 'new.name, new.city, new.genres'
+OLD_VALUES = 'old.name, old.city, old.genres'
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        fts = f'{table.lower()}_search'
+        if dialect == 'postgresql':
+            op.execute(f'CREATE INDEX ix_{fts}_document ON "{table}" USING gin ({DOCUMENT})')
+            op.execute(f'CREATE INDEX ix_{fts}_name_trgm ON "{table}" USING gin (name gin_trgm_ops)')
+        elif dialect == 'sqlite':
+            op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({COLUMNS}, content='{table}', content_rowid='id')")
+            op.execute(f'CREATE TRIGGER {fts}_ai AFTER INSERT ON "{table}" BEGIN '
+                       f'INSERT INTO {fts}(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END')
+            op.execute(f'CREATE TRIGGER {fts}_ad AFTER DELETE ON "{table}" BEGIN '
+                       f"INSERT INTO {fts}({fts}, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); END")
+            op.execute(f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {COLUMNS} ON "{table}" BEGIN '
+                       f"INSERT INTO {fts}({fts}, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); "
+                       f'INSERT INTO {fts}(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END')
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in ('Artist', 'Venue'):
+        fts = f'{table.lower()}_search'
+        if dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{fts}_name_trgm')
+            op.execute(f'DROP INDEX IF EXISTS ix_{fts}_document')
+        elif dialect == 'sqlite':
+            for trigger in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+            op.execute(f'DROP TABLE IF EXISTS {fts}')
@@ -0,0 +1,39 @@
+"""added show indexes
+
+Revision ID: 8fd881e8b332
+Revises: a6e42c199d0c
+Create Date: 2020-05-05 19:24:10.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8fd881e8b332'
+down_revision = 'a6e42c199d0c'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial index predicate per dialect)
+INDEXES = [
+    ('ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name', 'id'], {}),
+    ('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], {}),
+    ('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], {}),
+    ('ix_Show_start_time_id', 'Show', ['start_time', 'id'], {}),
+    ('ix_Show_upcoming_start_time', 'Show', ['start_time'],
+     {'postgresql_where': sa.text('is_upcoming'), 'sqlite_where': sa.text('is_upcoming = 1')}),
+]
+
+
+def upgrade():
+    # Build the indexes without locking the Show table against writes on Postgres.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, **where)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,65 @@
+"""normalized genres
+
+Revision ID: a6e42c199d0c
+Revises: 874ec1450a40
+Create Date: 2020-05-04 21:05:52.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e42c199d0c'
+down_revision = '874ec1450a40'
+branch_labels = None
+depends_on = None
+
+# forms.Genres member names at the time of this revision, in order. Genre ids are position + 1.
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'HipHop', 'HeavyMetal',
+          'Instrumental', 'Jazz', 'MusicalTheatre', 'Pop', 'Punk', 'RnB', 'Reggae', 'RockNRoll', 'Soul', 'Other']
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=30), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.bulk_insert(genre, [{'id': position + 1, 'name': name} for position, name in enumerate(GENRES)])
+
+    for table in ('Venue', 'Artist'):
+        key = f'{table.lower()}_id'
+        association = op.create_table(f'{table.lower()}genre',
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+        sa.ForeignKeyConstraint([key], [f'{table}.id'], ),
+        sa.PrimaryKeyConstraint('genre_id', key)
+        )
+        op.add_column(table, sa.Column('genre_mask', sa.Integer(), nullable=False, server_default='0'))
+
+        # Move the ", "-joined genre strings into the association table and the mask.
+        entity = sa.table(table, sa.column('id'), sa.column('genres'), sa.column('genre_mask'))
+        connection = op.get_bind()
+        rows = connection.execute(sa.select(entity.c.id, entity.c.genres)).fetchall()
+        links = []
+        for entity_id, genres in rows:
+            names = [name for name in GENRES if name in (genres or '').split(', ')]
+            mask = 0
+            for name in names:
+                genre_id = GENRES.index(name) + 1
+                mask |= 1 << (genre_id - 1)
+                links.append({'genre_id': genre_id, key: entity_id})
+            connection.execute(entity.update().where(entity.c.id == entity_id).values(
+                genre_mask=mask, genres=', '.join(names)))
+        if links:
+            op.bulk_insert(association, links)
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'genre_mask')
+        op.drop_table(f'{table.lower()}genre')
+    op.drop_table('Genre')
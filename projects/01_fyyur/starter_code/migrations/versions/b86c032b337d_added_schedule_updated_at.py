@@ -0,0 +1,35 @@
+"""added schedule_updated_at
+
+Revision ID: b86c032b337d
+Revises: 2b9e4c61d0f7
+Create Date: 2020-05-08 20:12:54.390127
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b86c032b337d'
+down_revision = '2b9e4c61d0f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        # Added nullable and backfilled: SQLite cannot add a column with a
+        # non-constant default, and rebuilding the table in batch mode would
+        # drop its search triggers. Other databases get the NOT NULL afterwards.
+        op.add_column(table, sa.Column('schedule_updated_at', sa.DateTime(), nullable=True))
+        entity = sa.table(table, sa.column('schedule_updated_at'))
+        op.execute(entity.update().values(schedule_updated_at=datetime.now()))
+        if op.get_bind().dialect.name != 'sqlite':
+            op.alter_column(table, 'schedule_updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'schedule_updated_at')
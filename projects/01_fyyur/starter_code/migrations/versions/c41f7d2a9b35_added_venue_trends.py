@@ -0,0 +1,38 @@
+"""added venue trends
+
+Revision ID: c41f7d2a9b35
+Revises: b86c032b337d
+Create Date: 2020-05-10 18:03:21.518264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f7d2a9b35'
+down_revision = 'b86c032b337d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left empty: the next `flask counters roll-over` (or reconcile) counts the window.
+    op.create_table('VenueTrend',
+    sa.Column('venue_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('shows', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_index('ix_VenueTrend_shows_venue_id', 'VenueTrend', ['shows', 'venue_id'])
+    op.create_table('TrendWindow',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('starts', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('TrendWindow')
+    op.drop_index('ix_VenueTrend_shows_venue_id', table_name='VenueTrend')
+    op.drop_table('VenueTrend')
@@ -0,0 +1,39 @@
+"""added tombstones
+
+Revision ID: d5a83e1f6c27
+Revises: c41f7d2a9b35
+Create Date: 2020-05-12 21:40:09.183527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a83e1f6c27'
+down_revision = 'c41f7d2a9b35'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text('deleted_at IS NULL')
+DELETED = sa.text('deleted_at IS NOT NULL')
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.add_column('Artist', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    # The directory only lists live venues, so its index only covers them.
+    op.drop_index('ix_Venue_state_city_name', table_name='Venue')
+    op.create_index('ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name', 'id'],
+                    postgresql_where=LIVE, sqlite_where=LIVE)
+    op.create_index('ix_Venue_deleted_at', 'Venue', ['deleted_at'], postgresql_where=DELETED, sqlite_where=DELETED)
+    op.create_index('ix_Artist_deleted_at', 'Artist', ['deleted_at'], postgresql_where=DELETED, sqlite_where=DELETED)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_deleted_at', table_name='Artist')
+    op.drop_index('ix_Venue_deleted_at', table_name='Venue')
+    op.drop_index('ix_Venue_state_city_name', table_name='Venue')
+    op.create_index('ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name', 'id'])
+    op.drop_column('Artist', 'deleted_at')
+    op.drop_column('Venue', 'deleted_at')
@@ -0,0 +1,189 @@
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+from routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+# DONE: implement any missing fields, as a database migration using Flask-Migrate
+
+
+venuegenres = db.Table('venuegenre',
+                       db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+                       db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True)
+                       )
+
+# DONE: implement any missing fields, as a database migration using Flask-Migrate
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        # /venues orders by area and name; /venues/browse filters by state and city.
+        # Only live venues, so listings never step over tombstones.
+        db.Index('ix_Venue_state_city_name', 'state', 'city', 'name', 'id',
+                 postgresql_where=db.text('deleted_at IS NULL'), sqlite_where=db.text('deleted_at IS NULL')),
+        # Tombstoned venues, for the purge job and the live_shows() filter.
+        db.Index('ix_Venue_deleted_at', 'deleted_at',
+                 postgresql_where=db.text('deleted_at IS NOT NULL'), sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    # Display copy of the genre names; genre_list and genre_mask are kept in step by genres.set_genres().
+    genres = db.Column(db.String(120))
+    # One bit per Genres member, see genres.py.
+    genre_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String(120))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Last time a show was added, removed or rolled over, or the venue or one of its
+    # artists was edited. Drives the ETag and Last-Modified of the schedule feeds.
+    schedule_updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    # Set when the venue is deleted; deletion.py purges its shows and then the row.
+    deleted_at = db.Column(db.DateTime)
+    shows = db.relationship('Show', backref='venue', lazy=True)
+    genre_list = db.relationship('Genre', secondary=venuegenres, lazy=True,
+                                 backref=db.backref('venues', lazy='dynamic'))
+
+    def __repr__(self):
+        return f'<Venue {self.id} -  {self.name}, {self.city}/{self.state}>'
+
+
+artistgenres = db.Table('artistgenre',
+                        db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+                        db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True)
+                        )
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_deleted_at', 'deleted_at',
+                 postgresql_where=db.text('deleted_at IS NOT NULL'), sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.Column(db.String(120))
+    genre_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String(120))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    schedule_updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    deleted_at = db.Column(db.DateTime)
+    shows = db.relationship('Show', backref='artist', lazy=True)
+    genre_list = db.relationship('Genre', secondary=artistgenres, lazy=True,
+                                 backref=db.backref('artists', lazy='dynamic'))
+
+
+# shows = db.Table('Show',
+#                  db.Column('id', db.Integer, primary_key=True),
+#                  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+#                  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+#                  db.Column('start_time', db.DateTime, nullable=False)
+#                  )
+
+# DONE Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Show(db.Model):
+    __tablename__ = 'Show'
+    # Matched to the predicates in details.py, show_listing.py and counters.py;
+    # test_query_plans.py fails if one of those queries stops using them.
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # Only shows not yet rolled over, which is what the roll-over job looks for.
+        db.Index('ix_Show_upcoming_start_time', 'start_time',
+                 postgresql_where=db.text('is_upcoming'), sqlite_where=db.text('is_upcoming = 1')),
+        # Ids of shows moved to ShowArchive must never be handed out again.
+        {'sqlite_autoincrement': True}
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    # Whether the show is currently counted in upcoming_shows_count; flipped by the roll-over job.
+    is_upcoming = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+
+class ShowArchive(db.Model):
+    __tablename__ = 'ShowArchive'
+    # Past shows moved out of Show by archive.archive_shows() on databases without
+    # native partitioning. Read both tables through archive.all_shows().
+    __table_args__ = (
+        db.Index('ix_ShowArchive_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_ShowArchive_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_ShowArchive_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    is_upcoming = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+
+class VenueTrend(db.Model):
+    __tablename__ = 'VenueTrend'
+    # Shows per venue in the current trending window, kept up to date by
+    # trending.py and read from the top of the index for the home page.
+    __table_args__ = (
+        db.Index('ix_VenueTrend_shows_venue_id', 'shows', 'venue_id'),
+    )
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), primary_key=True, autoincrement=False)
+    shows = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TrendWindow(db.Model):
+    __tablename__ = 'TrendWindow'
+    # One row: the start of the window VenueTrend currently counts.
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    starts = db.Column(db.DateTime, nullable=False)
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    # Rows mirror forms.Genres; id is the member's position + 1 and its genre_mask bit is 1 << (id - 1).
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(30), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Genre {self.id} - {self.name}>'
+
+
+# ----------------------------------------------------------------------------#
+# Tombstones.
+# ----------------------------------------------------------------------------#
+
+def live(model):
+    # Condition for venues or artists that have not been deleted.
+    return model.deleted_at.is_(None)
+
+
+def live_shows(shows, models=None):
+    # Condition for shows (Show, ShowArchive or all_shows()) whose venue and
+    # artist are both live, or just the sides in models. Deleted entities are
+    # few, so the subqueries read the small ix_*_deleted_at indexes.
+    keys = {Venue: shows.venue_id, Artist: shows.artist_id}
+    return db.and_(*(keys[model].not_in(db.select(model.id).where(model.deleted_at.is_not(None)))
+                     for model in models or (Venue, Artist)))
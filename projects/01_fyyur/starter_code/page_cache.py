@@ -0,0 +1,233 @@
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app, session
+
+from archive import all_shows
+from models import db
+from routing import on_primary
+
+
+# ----------------------------------------------------------------------------#
+# Page cache backends.
+# ----------------------------------------------------------------------------#
+
+# Both backends store strings under string keys with an optional TTL in seconds,
+# and keep the entity versions (see below) apart from the pages: versions are
+# never evicted, since losing one could make an old page reachable again.
+
+class MemoryCache:
+    # In-process LRU. Each worker has its own.
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl if ttl else 0, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get_version(self, entity):
+        return self.versions.get(entity)
+
+    def set_version(self, entity, token):
+        self.versions[entity] = token
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+class FileCache:
+    # One file per key under directory, shared by every worker on the host, and
+    # one per entity version under directory/versions. Writes go through a
+    # temporary file and os.replace, so readers never see a partial entry.
+    # Every version bump leaves the pages keyed on the old version behind, so
+    # about one set() in sweep_every sweeps the directory: it removes expired
+    # pages and leftover temporary files, then the oldest pages beyond
+    # max_entries.
+
+    def __init__(self, directory, max_entries=10000, sweep_every=1000):
+        self.directory = directory
+        self.version_directory = os.path.join(directory, 'versions')
+        self.max_entries = max_entries
+        self.sweep_every = sweep_every
+        os.makedirs(self.version_directory, exist_ok=True)
+
+    def _path(self, directory, key):
+        return os.path.join(directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _read(self, path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                expires, value = file.read().split('\n', 1)
+        except (OSError, ValueError):
+            return None, None
+        return float(expires), value
+
+    def _write(self, path, value, ttl=None):
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            file.write(f'{time.time() + ttl if ttl else 0}\n{value}')
+        os.replace(temporary, path)
+
+    def get(self, key):
+        expires, value = self._read(self._path(self.directory, key))
+        if expires and expires < time.time():
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._write(self._path(self.directory, key), value, ttl)
+        if random.randrange(self.sweep_every) == 0:
+            self.sweep()
+
+    def get_version(self, entity):
+        return self._read(self._path(self.version_directory, entity))[1]
+
+    def set_version(self, entity, token):
+        self._write(self._path(self.version_directory, entity), token)
+
+    def sweep(self):
+        # Returns the number of files removed. Other workers may be sweeping at
+        # the same time, hence the ignored FileNotFoundErrors.
+        now = time.time()
+        removed, kept = 0, []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            try:
+                if entry.name.startswith('.tmp'):
+                    stale = entry.stat().st_mtime < now - 60
+                else:
+                    with open(entry.path, encoding='utf-8') as file:
+                        expires = float(file.readline() or 0)
+                    stale = bool(expires) and expires < now
+                    if not stale:
+                        kept.append((entry.stat().st_mtime, entry.path))
+                if stale:
+                    os.remove(entry.path)
+                    removed += 1
+            except (FileNotFoundError, ValueError):
+                continue
+        kept.sort()
+        for _, path in kept[:max(len(kept) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def clear(self):
+        for directory in (self.directory, self.version_directory):
+            for entry in os.scandir(directory):
+                if entry.is_file():
+                    os.remove(entry.path)
+
+
+BACKENDS = {
+    'memory': lambda config: MemoryCache(config['PAGE_CACHE_SIZE']),
+    'file': lambda config: FileCache(config['PAGE_CACHE_DIR'], config['PAGE_CACHE_FILES']),
+}
+
+
+def init_page_cache(app):
+    app.config.setdefault('PAGE_CACHE_BACKEND', 'memory')
+    app.config.setdefault('PAGE_CACHE_SIZE', 1024)
+    app.config.setdefault('PAGE_CACHE_FILES', 10000)
+    app.config.setdefault('PAGE_CACHE_TTL', 300)
+    app.extensions['page_cache'] = BACKENDS[app.config['PAGE_CACHE_BACKEND']](app.config)
+
+
+# ----------------------------------------------------------------------------#
+# Versioned keys.
+# ----------------------------------------------------------------------------#
+
+# Every cached page or fragment names the entities it was rendered from, e.g.
+# 'venue:3' or 'venues' for the directory. Its key includes the current version
+# of each, so bumping an entity's version after a write makes every dependent
+# entry unreachable at once. Versions are random tokens rather than counters so
+# two workers bumping together cannot end up on a version that was already
+# used. 'all' is part of every key, for bulk writes that touch everything.
+
+def _cache():
+    return current_app.extensions['page_cache']
+
+
+def versions(entities):
+    # An entity without a version (never written, or its version was lost) gets
+    # a fresh one rather than a fixed default, so no page cached before can match.
+    cache = _cache()
+    tokens = []
+    for entity in ('all', *entities):
+        token = cache.get_version(entity)
+        if token is None:
+            token = uuid.uuid4().hex
+            cache.set_version(entity, token)
+        tokens.append(token)
+    return tokens
+
+
+def bump(*entities):
+    # Call after the write has committed, so nothing can re-cache the old data.
+    cache = _cache()
+    for entity in entities:
+        cache.set_version(entity, uuid.uuid4().hex)
+
+
+def bump_all():
+    bump('all')
+
+
+def cached(name, entities, render):
+    # Returns render()'s output for name, from the cache when none of entities
+    # changed since it was stored. Requests with pending flash messages render
+    # fresh, since the layout shows them. Misses render from the primary.
+    if session.get('_flashes'):
+        return render()
+    key = ':'.join([name, *versions(entities)])
+    value = _cache().get(key)
+    if value is None:
+        with on_primary():
+            value = render()
+        _cache().set(key, value, current_app.config['PAGE_CACHE_TTL'])
+    return value
+
+
+def venue_entities(venue_id):
+    # What a change to a venue invalidates: its page, the directory and the
+    # pages of the artists that played there.
+    shows = all_shows()
+    artist_ids = db.session.query(shows.artist_id).filter(shows.venue_id == venue_id).distinct()
+    return [f'venue:{venue_id}', 'venues', *[f'artist:{artist_id}' for artist_id, in artist_ids]]
+
+
+def artist_entities(artist_id):
+    shows = all_shows()
+    venue_ids = db.session.query(shows.venue_id).filter(shows.artist_id == artist_id).distinct()
+    return [f'artist:{artist_id}', 'artists', *[f'venue:{venue_id}' for venue_id, in venue_ids]]
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+
+from flask import jsonify
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from instrumentation import require_admin_token
+
+# pool_config.py is shared with the other backends, two directories up.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from pool_config import POOL_DEFAULTS, engine_options as shared_engine_options
+
+
+# ----------------------------------------------------------------------------#
+# Connection pooling.
+# ----------------------------------------------------------------------------#
+
+# The DATABASE_POOL_* settings in config.py become SQLALCHEMY_ENGINE_OPTIONS for
+# the primary and every replica, built by projects/pool_config.py, which the
+# trivia and coffee shop backends use too. Each engine gets a TimedQueuePool,
+# which counts how long requests wait for a connection, how often the pool opens
+# overflow connections and how often it times out. /admin/pool-stats shows those numbers
+# next to the pool's current checked-out and overflow counts, which is what
+# workers * (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW) has to be sized from
+# against the database's max_connections.
+
+class PoolStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def record(self, seconds, overflowed):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.overflows += overflowed
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_ms': round(self.wait_seconds * 1000, 2),
+                'avg_wait_ms': round(self.wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 2),
+                'overflows': self.overflows,
+                'timeouts': self.timeouts,
+            }
+
+    def clear(self):
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.overflows = 0
+        self.timeouts = 0
+
+
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow = self.overflow()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        # overflow() counts up from -pool_size as connections are opened.
+        self.stats.record(time.perf_counter() - started, self.overflow() > max(overflow, 0))
+        return connection
+
+    def metrics(self):
+        return dict(self.stats.snapshot(), size=self.size(), checked_out=self.checkedout(),
+                    overflow=max(self.overflow(), 0), max_overflow=self._max_overflow)
+
+
+def engine_options(url, config):
+    # Engine options for url from the DATABASE_* settings, with a TimedQueuePool.
+    return shared_engine_options(url, config, poolclass=TimedQueuePool)
+
+
+def init_pooling(app):
+    # Call before db.init_app(app). Options set in SQLALCHEMY_ENGINE_OPTIONS win.
+    for name, default in POOL_DEFAULTS.items():
+        app.config.setdefault(name, default)
+    options = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    def pool_stats():
+        # One entry per engine ('primary' and the replica binds).
+        require_admin_token()
+        db = app.extensions['sqlalchemy']
+        return jsonify({bind or 'primary': engine.pool.metrics() if isinstance(engine.pool, TimedQueuePool)
+                        else {'status': engine.pool.status()} for bind, engine in db.engines.items()})
+
+    app.add_url_rule('/admin/pool-stats', 'pool_stats', pool_stats)
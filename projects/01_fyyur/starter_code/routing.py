@@ -0,0 +1,89 @@
+import random
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+# ----------------------------------------------------------------------------#
+# Read/write routing.
+# ----------------------------------------------------------------------------#
+
+# Read replicas are ordinary SQLALCHEMY_BINDS entries listed in
+# READ_REPLICA_BINDS (see config.py). GET requests read from a random replica,
+# everything else and every flush goes to the primary. After a request commits
+# a write, the user's reads stay on the primary for READ_YOUR_WRITES_SECONDS so
+# they see their own change before replication catches up. Pages rendered into
+# the page cache are always read from the primary: a lagging replica would
+# otherwise cache old data under the version a write has just bumped.
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            replica = g.get('read_replica')
+            if replica is not None:
+                return self._db.engines[replica]
+        return super().get_bind(mapper, clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def on_primary():
+    # Sends the request's reads to the primary inside the block.
+    replica = g.get('read_replica')
+    g.read_replica = None
+    try:
+        yield
+    finally:
+        g.read_replica = replica
+
+
+# A session has written once it flushed changes or ran an INSERT, UPDATE or
+# DELETE (bulk updates never flush); the request has written once such a
+# session commits.
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _committed(db_session):
+    if db_session.info.pop('wrote', False) and has_request_context():
+        g.committed_write = True
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _rolled_back(db_session):
+    db_session.info.pop('wrote', None)
+
+
+def init_routing(app):
+    app.config.setdefault('READ_REPLICA_BINDS', [])
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+
+    @app.before_request
+    def choose_read_replica():
+        g.read_replica = None
+        replicas = app.config['READ_REPLICA_BINDS']
+        if not replicas or request.method not in READ_METHODS:
+            return
+        if time.time() - session.get('last_write', 0) < app.config['READ_YOUR_WRITES_SECONDS']:
+            return
+        g.read_replica = random.choice(replicas)
+
+    @app.after_request
+    def remember_write(response):
+        if g.get('committed_write'):
+            session['last_write'] = time.time()
+        return response
@@ -0,0 +1,134 @@
+import math
+import re
+
+from sqlalchemy import DDL, event
+
+from models import db, Venue, Artist, live
+
+SEARCH_RESULTS_PER_PAGE = 20
+
+
+# ----------------------------------------------------------------------------#
+# Search indexes.
+# ----------------------------------------------------------------------------#
+
+# Venues and artists are searched over name, city and genres. Postgres uses a
+# tsvector GIN index for ranked word matches plus a pg_trgm index on name so
+# partial names ("Hop") still hit an index. SQLite (tests, local setups) uses an
+# FTS5 table kept in step with triggers. The same DDL is applied by the
+# "added search indexes" migration.
+
+SEARCH_COLUMNS = ('name', 'city', 'genres')
+
+
+def search_table(model):
+    return f'{model.__tablename__.lower()}_search'
+
+
+def search_document(table):
+    columns = " || ' ' || ".join(f'coalesce({table}{column}, \'\')' for column in SEARCH_COLUMNS)
+    return f"to_tsvector('simple', {columns})"
+
+
+def postgres_ddl(model):
+    table = model.__tablename__
+    index = search_table(model)
+    return [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        f'CREATE INDEX IF NOT EXISTS ix_{index}_document ON "{table}" USING gin ({search_document("")})',
+        f'CREATE INDEX IF NOT EXISTS ix_{index}_name_trgm ON "{table}" USING gin (name gin_trgm_ops)',
+    ]
+
+
+def sqlite_ddl(model):
+    table = model.__tablename__
+    fts = search_table(model)
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', content_rowid='id')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table}" BEGIN '
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table}" BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON "{table}" BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+for _model in (Venue, Artist):
+    for _statement in postgres_ddl(_model):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+    for _statement in sqlite_ddl(_model):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+    event.listen(_model.__table__, 'before_drop',
+                 DDL(f'DROP TABLE IF EXISTS {search_table(_model)}').execute_if(dialect='sqlite'))
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+def _words(term):
+    return re.findall(r'\w+', term.lower())
+
+
+def _postgres_matches(model, term, words):
+    document = db.literal_column(search_document(f'"{model.__tablename__}".'))
+    pattern = '%' + re.sub(r'([\\%_])', r'\\\1', term) + '%'
+    condition = model.name.ilike(pattern)
+    rank = db.func.similarity(model.name, term)
+    if words:
+        query = db.func.to_tsquery('simple', ' & '.join(f'{word}:*' for word in words))
+        condition = db.or_(document.op('@@')(query), condition)
+        rank = rank + db.func.ts_rank(document, query)
+    return db.session.query(model).filter(condition), rank.desc()
+
+
+def _sqlite_matches(model, words):
+    fts = search_table(model)
+    index = db.table(fts, db.column('rowid'))
+    query = ' '.join(f'"{word}"*' for word in words)
+    # bm25 only works in a plain FTS query, so rank inside a subquery. Weights: name, city, genres.
+    matches = db.select(
+        index.c.rowid, db.func.bm25(db.literal_column(fts), 10.0, 2.0, 1.0).label('rank')
+    ).where(db.literal_column(fts).op('MATCH')(query)).subquery()
+    return db.session.query(model).join(matches, matches.c.rowid == model.id), matches.c.rank
+
+
+def search(model, term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    # Returns one page of venues or artists matching term, best match first,
+    # together with the total number of matches.
+    term = term.strip()
+    words = _words(term)
+    dialect = db.session.get_bind().dialect.name
+
+    if not term:
+        query, order = db.session.query(model), model.name
+    elif dialect == 'postgresql':
+        query, order = _postgres_matches(model, term, words)
+    elif dialect == 'sqlite' and words:
+        query, order = _sqlite_matches(model, words)
+    else:
+        query, order = db.session.query(model).filter(model.name.ilike(f'%{term}%')), model.name
+
+    query = query.filter(live(model))
+    page = max(page, 1)
+    rows = query.with_entities(
+        model.id, model.name, model.upcoming_shows_count, db.func.count().over()
+    ).order_by(order, model.id).limit(per_page).offset((page - 1) * per_page).all()
+    count = rows[0][3] if rows else (query.count() if page > 1 else 0)
+
+    return {
+        "count": count,
+        "page": page,
+        "pages": math.ceil(count / per_page),
+        "data": [{
+            "id": entity_id,
+            "name": name,
+            "num_upcoming_shows": num_upcoming_shows
+        } for entity_id, name, num_upcoming_shows, _ in rows]
+    }
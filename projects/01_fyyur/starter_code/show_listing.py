@@ -0,0 +1,81 @@
+import base64
+from datetime import datetime
+
+from archive import all_shows
+from models import db, Venue, Artist, Show, live
+
+SHOWS_PER_PAGE = 50
+SHOWS_STREAM_BATCH = 1000
+
+
+# ----------------------------------------------------------------------------#
+# Show listing.
+# ----------------------------------------------------------------------------#
+
+# /shows is paged with a keyset on (start_time, id) rather than OFFSET, so every
+# page costs the same no matter how deep it is. The cursor is opaque to clients.
+
+def encode_cursor(start_time, show_id):
+    return base64.urlsafe_b64encode(f'{start_time.isoformat()}|{show_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    # Raises ValueError for anything encode_cursor did not produce.
+    try:
+        start_time, show_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(start_time), int(show_id)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def _show_query(start=None, end=None, upcoming_only=False, after=None, now=None):
+    # Upcoming shows are never archived, so only the full listing reads the archive.
+    shows = Show if upcoming_only else all_shows()
+    query = db.session.query(
+        shows.id, shows.start_time, shows.venue_id, Venue.name, shows.artist_id, Artist.name, Artist.image_link
+    ).join(Venue, db.and_(Venue.id == shows.venue_id, live(Venue))).join(
+        Artist, db.and_(Artist.id == shows.artist_id, live(Artist)))
+    if upcoming_only:
+        query = query.filter(shows.start_time > (now or datetime.now()))
+    if start:
+        query = query.filter(shows.start_time >= start)
+    if end:
+        query = query.filter(shows.start_time < end)
+    if after:
+        query = query.filter(db.tuple_(shows.start_time, shows.id) > db.tuple_(*after))
+    return query.order_by(shows.start_time, shows.id)
+
+
+def _show_dict(row):
+    show_id, start_time, venue_id, venue_name, artist_id, artist_name, artist_image_link = row
+    return {
+        "id": show_id,
+        "start_time": start_time,
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "artist_image_link": artist_image_link
+    }
+
+
+def show_page(cursor=None, limit=SHOWS_PER_PAGE, **filters):
+    # Returns (shows, next_cursor); next_cursor is None on the last page.
+    after = decode_cursor(cursor) if cursor else None
+    rows = _show_query(after=after, **filters).limit(limit + 1).all()
+    shows = [_show_dict(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return shows, next_cursor
+
+
+def iter_shows(batch_size=SHOWS_STREAM_BATCH, **filters):
+    # Yields every matching show, walking the keyset a batch at a time so memory
+    # stays flat and each query stays short.
+    after = None
+    while True:
+        rows = _show_query(after=after, **filters).limit(batch_size).all()
+        for row in rows:
+            yield _show_dict(row)
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1][1], rows[-1][0])
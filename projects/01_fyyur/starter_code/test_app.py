@@ -0,0 +1,917 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from babel.dates import UTC, format_datetime as babel_format_datetime
+from flask import flash
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import QueuePool, StaticPool
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import app
+from archive import archive_shows
+from bench_routes import benchmark
+from bookings import check_bookings, find_conflicts
+from counters import reconcile, roll_over
+from deletion import delete_entity, purge_deleted
+from details import artist_detail, venue_detail
+from feeds import _ics_line
+from directory import venue_directory
+from generator import generate
+from formatting import format_datetime, format_datetimes, parse_datetime
+from genres import browse, genre_values, set_genres
+from importer import import_file
+from instrumentation import fingerprint
+from models import db, Venue, Artist, Show, ShowArchive, Genre, venuegenres
+from page_cache import FileCache, MemoryCache, bump, cached
+from pool_config import engine_options as shared_engine_options, pool_settings
+from pooling import TimedQueuePool, engine_options
+from search import search
+from show_listing import iter_shows, show_page
+from trending import roll_trends, trending_venues
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.client = self.app.test_client
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.app.extensions['page_cache'].clear()
+        db.create_all()
+        self.seed()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def seed(self):
+        now = datetime.now()
+        musical_hop = Venue(name='The Musical Hop', city='San Francisco', state='CA', seeking_talent=True)
+        dueling_pianos = Venue(name='The Dueling Pianos Bar', city='New York', state='NY', seeking_talent=False)
+        park_square = Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA',
+                            seeking_talent=False)
+        guns_n_petals = Artist(name='Guns N Petals', city='San Francisco', state='CA', seeking_venue=True)
+        wild_sax_band = Artist(name='The Wild Sax Band', city='San Francisco', state='CA', seeking_venue=False)
+        set_genres(musical_hop, ['Jazz', 'Reggae'])
+        set_genres(dueling_pianos, ['Classical'])
+        set_genres(park_square, ['RockNRoll', 'Jazz', 'Classical', 'Folk'])
+        set_genres(guns_n_petals, ['RockNRoll'])
+        set_genres(wild_sax_band, ['Jazz', 'Classical'])
+        db.session.add_all([musical_hop, dueling_pianos, park_square, guns_n_petals, wild_sax_band])
+        db.session.flush()
+        db.session.add_all([
+            Show(venue_id=musical_hop.id, artist_id=guns_n_petals.id, start_time=now - timedelta(days=30)),
+            Show(venue_id=park_square.id, artist_id=wild_sax_band.id, start_time=now + timedelta(days=3)),
+            Show(venue_id=park_square.id, artist_id=wild_sax_band.id, start_time=now + timedelta(days=10)),
+            Show(venue_id=park_square.id, artist_id=guns_n_petals.id, start_time=now - timedelta(days=1)),
+        ])
+        db.session.commit()
+        reconcile()
+
+        self.musical_hop_id, self.dueling_pianos_id, self.park_square_id = \
+            musical_hop.id, dueling_pianos.id, park_square.id
+        self.guns_n_petals_id, self.wild_sax_band_id = guns_n_petals.id, wild_sax_band.id
+
+    @contextmanager
+    def count_queries(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    def test_get_venues(self):
+        res = self.client().get('/venues')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertIn(b'Park Square Live Music &amp; Coffee', res.data)
+        self.assertIn(b'New York, NY', res.data)
+
+    def test_venues_issues_single_query(self):
+        for i in range(20):
+            db.session.add(Venue(name=f'Venue {i}', city=f'City {i % 5}', state='TX'))
+        db.session.commit()
+
+        with self.count_queries() as statements:
+            res = self.client().get('/venues')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(statements), 1)
+
+    def test_venue_directory_counts_upcoming_shows(self):
+        areas = {(area['city'], area['state']): area['venues'] for area in venue_directory()}
+
+        self.assertEqual(set(areas), {('San Francisco', 'CA'), ('New York', 'NY')})
+        counts = {venue['name']: venue['num_upcoming_shows'] for venue in areas[('San Francisco', 'CA')]}
+        self.assertEqual(counts, {'The Musical Hop': 0, 'Park Square Live Music & Coffee': 2})
+        self.assertEqual(areas[('New York', 'NY')][0]['num_upcoming_shows'], 0)
+
+    def test_create_show_updates_counters(self):
+        res = self.client().post('/shows/create', data={
+            'artist_id': self.guns_n_petals_id,
+            'venue_id': self.musical_hop_id,
+            'start_time': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.assertEqual(res.status_code, 200)
+
+        venue = db.session.get(Venue, self.musical_hop_id)
+        artist = db.session.get(Artist, self.guns_n_petals_id)
+        self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (1, 1))
+        self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (1, 2))
+        show = Show.query.order_by(Show.id.desc()).first()
+        self.assertEqual((show.venue_id, show.artist_id), (self.musical_hop_id, self.guns_n_petals_id))
+
+    def test_create_show_rejects_non_numeric_ids(self):
+        res = self.client().post('/shows/create', data={
+            'artist_id': 'guns',
+            'venue_id': self.musical_hop_id,
+            'start_time': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(Show.query.count(), 4)
+
+    def test_create_show_rejects_double_booking(self):
+        start_time = db.session.query(Show.start_time).filter(Show.venue_id == self.park_square_id).order_by(
+            Show.start_time.desc()).limit(1).scalar()
+        for venue_id, artist_id, offset in ((self.park_square_id, self.guns_n_petals_id, timedelta(hours=1)),
+                                            (self.musical_hop_id, self.wild_sax_band_id, -timedelta(minutes=90))):
+            res = self.client().post('/shows/create', data={
+                'artist_id': artist_id,
+                'venue_id': venue_id,
+                'start_time': (start_time + offset).strftime('%Y-%m-%d %H:%M:%S')
+            })
+            self.assertEqual(res.status_code, 302)
+        self.assertEqual(Show.query.count(), 4)
+
+        res = self.client().post('/shows/create', data={
+            'artist_id': self.guns_n_petals_id,
+            'venue_id': self.park_square_id,
+            'start_time': (start_time + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Show.query.count(), 5)
+
+    def test_check_bookings_within_a_batch_and_against_archive(self):
+        old_show_id, start_time = db.session.query(Show.id, Show.start_time).filter(
+            Show.venue_id == self.musical_hop_id).one()
+        archive_shows()
+        proposals = [
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.guns_n_petals_id,
+             'start_time': start_time + timedelta(minutes=30)},
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.wild_sax_band_id,
+             'start_time': start_time + timedelta(minutes=60)},
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.wild_sax_band_id,
+             'start_time': start_time + timedelta(minutes=180)},
+        ]
+        first, second, third = check_bookings(proposals)
+
+        self.assertEqual([(c['conflict'], c['show_id']) for c in first], [('artist', old_show_id)])
+        self.assertEqual([(c['conflict'], c['proposal']) for c in second], [('venue', 0)])
+        # Back to back with the second one.
+        self.assertEqual(third, [])
+
+    def test_check_shows_endpoint(self):
+        start_time = db.session.query(Show.start_time).filter(Show.artist_id == self.wild_sax_band_id).order_by(
+            Show.start_time).limit(1).scalar()
+        res = self.client().post('/shows/check', json={'shows': [
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.wild_sax_band_id,
+             'start_time': (start_time + timedelta(minutes=15)).isoformat()},
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.guns_n_petals_id,
+             'start_time': (start_time + timedelta(days=1)).isoformat()},
+        ]})
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(data['conflicts'], 1)
+        self.assertEqual(data['shows'][0]['conflicts'][0]['venue_id'], self.park_square_id)
+        self.assertEqual(data['shows'][1]['conflicts'], [])
+
+        self.assertEqual(self.client().post('/shows/check', json={'shows': [{'venue_id': 1}]}).status_code, 400)
+
+    def test_deleted_venues_do_not_block_bookings(self):
+        start_time = db.session.query(Show.start_time).filter(Show.artist_id == self.wild_sax_band_id).order_by(
+            Show.start_time).limit(1).scalar()
+        proposal = {'venue_id': self.dueling_pianos_id, 'artist_id': self.wild_sax_band_id,
+                    'start_time': start_time + timedelta(minutes=15)}
+        self.assertEqual(len(check_bookings([proposal])[0]), 1)
+
+        # Too many shows to purge inline: they stay until purge-deleted runs.
+        self.assertTrue(delete_entity(Venue, self.park_square_id, batch_size=2))
+        self.assertEqual(check_bookings([proposal]), [[]])
+        self.assertEqual(find_conflicts(proposal['venue_id'], proposal['artist_id'], proposal['start_time']), [])
+
+    def test_check_shows_normalizes_utc_offsets(self):
+        start_time = db.session.query(Show.start_time).filter(Show.artist_id == self.wild_sax_band_id).order_by(
+            Show.start_time).limit(1).scalar()
+        aware = (start_time + timedelta(minutes=15)).astimezone(timezone(timedelta(hours=-11)))
+        res = self.client().post('/shows/check', json={'shows': [
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.wild_sax_band_id,
+             'start_time': aware.isoformat()},
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.guns_n_petals_id,
+             'start_time': (start_time + timedelta(minutes=30)).isoformat()},
+        ]})
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(data['shows'][0]['start_time'], (start_time + timedelta(minutes=15)).isoformat())
+        self.assertEqual(data['shows'][0]['conflicts'][0]['venue_id'], self.park_square_id)
+        self.assertEqual(data['shows'][1]['conflicts'][0]['proposal'], 0)
+
+        for start_time in (None, 'not a date', 42):
+            res = self.client().post('/shows/check', json={'shows': [
+                {'venue_id': self.dueling_pianos_id, 'artist_id': self.wild_sax_band_id, 'start_time': start_time}]})
+            self.assertEqual(res.status_code, 400)
+
+    def test_delete_venue_updates_artist_counters(self):
+        res = self.client().delete(f'/venues/{self.park_square_id}')
+        self.assertEqual(res.status_code, 302)
+
+        self.assertIsNone(db.session.get(Venue, self.park_square_id))
+        wild_sax_band = db.session.get(Artist, self.wild_sax_band_id)
+        guns_n_petals = db.session.get(Artist, self.guns_n_petals_id)
+        self.assertEqual((wild_sax_band.upcoming_shows_count, wild_sax_band.past_shows_count), (0, 0))
+        self.assertEqual((guns_n_petals.upcoming_shows_count, guns_n_petals.past_shows_count), (0, 1))
+
+    def test_trending_venues_follow_show_writes(self):
+        self.assertEqual([(venue['name'], venue['num_shows']) for venue in trending_venues()],
+                         [('Park Square Live Music & Coffee', 1)])
+        for days in (1, 2):
+            self.client().post('/shows/create', data={
+                'artist_id': self.guns_n_petals_id,
+                'venue_id': self.dueling_pianos_id,
+                'start_time': (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+            })
+        res = self.client().get('/')
+        self.assertIn(b'Trending venues this week', res.data)
+        self.assertLess(res.data.index(b'The Dueling Pianos Bar'), res.data.index(b'Park Square'))
+
+        self.client().delete(f'/venues/{self.dueling_pianos_id}')
+        res = self.client().get('/api/v1/venues/trending?limit=5')
+        self.assertEqual([venue['id'] for venue in res.get_json()['venues']], [self.park_square_id])
+
+    def test_trending_window_rolls_over_daily(self):
+        self.assertFalse(roll_trends())
+        self.assertTrue(roll_trends(datetime.now() + timedelta(days=5)))
+        # The show in three days has left the window and the one in ten has entered it.
+        self.assertEqual([(venue['id'], venue['num_shows']) for venue in trending_venues()],
+                         [(self.park_square_id, 1)])
+        self.assertTrue(roll_trends(datetime.now() + timedelta(days=20)))
+        self.assertEqual(trending_venues(), [])
+
+    def test_delete_artist_hides_and_purges_it(self):
+        res = self.client().delete(f'/artists/{self.guns_n_petals_id}')
+        self.assertEqual(res.status_code, 302)
+
+        self.assertIsNone(db.session.get(Artist, self.guns_n_petals_id))
+        self.assertEqual(Show.query.filter_by(artist_id=self.guns_n_petals_id).count(), 0)
+        park_square = db.session.get(Venue, self.park_square_id)
+        self.assertEqual((park_square.upcoming_shows_count, park_square.past_shows_count), (2, 0))
+        self.assertNotIn(b'Guns N Petals', self.client().get('/artists').data)
+        self.assertEqual(self.client().get(f'/artists/{self.guns_n_petals_id}/edit').status_code, 404)
+        self.assertEqual(self.client().delete(f'/artists/{self.guns_n_petals_id}').status_code, 302)
+
+    def test_large_venues_are_hidden_then_purged_in_batches(self):
+        self.assertTrue(delete_entity(Venue, self.park_square_id, batch_size=2))
+
+        # Hidden everywhere, but the shows are left for the purge job.
+        self.assertEqual(Show.query.filter_by(venue_id=self.park_square_id).count(), 3)
+        self.assertNotIn(b'Park Square', self.client().get('/venues').data)
+        self.assertEqual(search(Venue, 'Park')['count'], 0)
+        self.assertEqual(self.client().get(f'/venues/{self.park_square_id}').status_code, 404)
+        self.assertEqual(self.client().get(f'/api/v1/venues/{self.park_square_id}').status_code, 404)
+        self.assertNotIn('Park Square', self.client().get('/shows').get_data(as_text=True))
+        self.assertEqual(artist_detail(self.wild_sax_band_id)['upcoming_shows'], [])
+        reconcile()
+        wild_sax_band = db.session.get(Artist, self.wild_sax_band_id)
+        self.assertEqual((wild_sax_band.upcoming_shows_count, wild_sax_band.past_shows_count), (0, 0))
+        self.assertFalse(delete_entity(Venue, self.park_square_id))
+
+        with self.count_queries() as statements:
+            self.assertEqual(purge_deleted(batch_size=2), (1, 3))
+        self.assertEqual(len([s for s in statements if s.startswith('DELETE FROM "Show"')]), 2)
+        self.assertIsNone(db.session.query(Venue.id).filter(Venue.id == self.park_square_id).scalar())
+        self.assertEqual(db.session.query(venuegenres).filter_by(venue_id=self.park_square_id).count(), 0)
+
+    def test_roll_over_moves_started_shows_to_past(self):
+        self.assertEqual(roll_over(), 0)
+        self.assertEqual(roll_over(datetime.now() + timedelta(days=5)), 1)
+
+        venue = db.session.get(Venue, self.park_square_id)
+        artist = db.session.get(Artist, self.wild_sax_band_id)
+        self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (1, 2))
+        self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (1, 1))
+
+    def test_roll_over_skips_shows_of_deleted_venues(self):
+        self.assertTrue(delete_entity(Venue, self.park_square_id, batch_size=2))
+        self.assertEqual(roll_over(datetime.now() + timedelta(days=5)), 0)
+
+        artist = db.session.get(Artist, self.wild_sax_band_id)
+        self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (0, 0))
+        reconcile()
+        self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (0, 0))
+
+    def test_reconcile_rebuilds_counters(self):
+        Venue.query.update({Venue.upcoming_shows_count: 42, Venue.past_shows_count: 42})
+        db.session.commit()
+
+        reconcile()
+
+        venue = db.session.get(Venue, self.park_square_id)
+        self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (2, 1))
+
+    def test_archived_shows_read_through(self):
+        self.assertEqual(archive_shows(after_days=7), 1)
+        self.assertEqual(Show.query.count(), 3)
+        self.assertEqual(ShowArchive.query.count(), 1)
+
+        data = venue_detail(self.musical_hop_id)
+        self.assertEqual([show['artist_name'] for show in data['past_shows']], ['Guns N Petals'])
+        self.assertEqual(len(show_page()[0]), 4)
+        self.assertEqual(len(show_page(upcoming_only=True)[0]), 2)
+        reconcile()
+        self.assertEqual(db.session.get(Venue, self.musical_hop_id).past_shows_count, 1)
+
+        self.client().delete(f'/venues/{self.musical_hop_id}')
+        self.assertEqual(ShowArchive.query.count(), 0)
+        self.assertEqual(db.session.get(Artist, self.guns_n_petals_id).past_shows_count, 1)
+
+    def test_search_venues(self):
+        res = self.client().post('/venues/search', data={'search_term': 'Music'})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Number of search results for "Music": 2', res.data)
+
+    def test_search_is_case_insensitive_and_ranked(self):
+        results = search(Venue, 'hop')
+        self.assertEqual(results['count'], 1)
+        self.assertEqual(results['data'][0]['name'], 'The Musical Hop')
+
+        # A name match outranks a genre match.
+        results = search(Artist, 'jazz sax')
+        self.assertEqual([artist['name'] for artist in results['data']], ['The Wild Sax Band'])
+        self.assertEqual(search(Venue, 'jazz')['data'][0]['name'], 'The Musical Hop')
+
+    def test_search_matches_city_and_genres(self):
+        self.assertEqual(search(Venue, 'new york')['data'][0]['name'], 'The Dueling Pianos Bar')
+        self.assertEqual(search(Venue, 'classical')['count'], 2)
+
+    def test_search_pages_results(self):
+        for i in range(25):
+            db.session.add(Venue(name=f'Jazz Club {i}', city='Austin', state='TX'))
+        db.session.commit()
+
+        first = search(Venue, 'club', per_page=10)
+        last = search(Venue, 'club', page=3, per_page=10)
+
+        self.assertEqual((first['count'], first['pages'], len(first['data'])), (25, 3, 10))
+        self.assertEqual((last['count'], len(last['data'])), (25, 5))
+        self.assertEqual(search(Venue, 'club', page=4, per_page=10)['data'], [])
+
+    def test_search_index_follows_updates(self):
+        venue = db.session.get(Venue, self.dueling_pianos_id)
+        venue.name = 'The Grand Piano Hall'
+        db.session.commit()
+
+        self.assertEqual(search(Venue, 'dueling')['count'], 0)
+        self.assertEqual(search(Venue, 'grand')['data'][0]['id'], self.dueling_pianos_id)
+
+    def test_set_genres_writes_all_representations(self):
+        venue = db.session.get(Venue, self.park_square_id)
+
+        self.assertEqual(venue.genres, 'Classical, Folk, Jazz, RockNRoll')
+        self.assertEqual(genre_values(venue.genre_mask), ('Classical', 'Folk', 'Jazz', 'Rock n Roll'))
+        self.assertEqual(sorted(genre.name for genre in venue.genre_list), ['Classical', 'Folk', 'Jazz', 'RockNRoll'])
+        self.assertEqual(db.session.get(Genre, 11).venues.count(), 2)
+
+    def test_browse_filters_by_genre_and_location(self):
+        results = browse(Venue, ['Jazz'], state='CA', seeking=True)
+        self.assertEqual([venue['name'] for venue in results['data']], ['The Musical Hop'])
+
+        results = browse(Venue, ['Jazz', 'Classical'], match_all=True)
+        self.assertEqual([venue['name'] for venue in results['data']], ['Park Square Live Music & Coffee'])
+
+        facets = {facet['name']: facet['count'] for facet in browse(Venue, state='CA')['facets']}
+        self.assertEqual((facets['Jazz'], facets['Classical'], facets['Blues']), (2, 1, 0))
+
+    def test_browse_venues_endpoint(self):
+        res = self.client().get('/venues/browse?genre=Classical&genre=Unknown')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'2 venues', res.data)
+        self.assertIn(b'The Dueling Pianos Bar', res.data)
+
+    def test_edit_venue_updates_genres(self):
+        res = self.client().post(f'/venues/{self.dueling_pianos_id}/edit', data={
+            'name': 'The Dueling Pianos Bar', 'city': 'New York', 'state': 'NY', 'address': '335 Delancey Street',
+            'phone': '914-003-1132', 'genres': ['Blues', 'Jazz'], 'facebook_link': '', 'image_link': '',
+            'website': '', 'seeking_talent': 'False', 'seeking_description': ''
+        })
+        self.assertEqual(res.status_code, 302)
+
+        venue = db.session.get(Venue, self.dueling_pianos_id)
+        self.assertEqual(genre_values(venue.genre_mask), ('Blues', 'Jazz'))
+        self.assertEqual(sorted(genre.name for genre in venue.genre_list), ['Blues', 'Jazz'])
+
+    def test_show_venue_issues_single_query(self):
+        with self.count_queries() as statements:
+            res = self.client().get(f'/venues/{self.park_square_id}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(statements), 1)
+        self.assertIn(b'2 Upcoming', res.data)
+        self.assertIn(b'Guns N Petals', res.data)
+
+    def test_show_artist(self):
+        res = self.client().get(f'/artists/{self.guns_n_petals_id}')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'2 Past', res.data)
+        self.assertIn(b'The Musical Hop', res.data)
+
+    def test_show_missing_venue(self):
+        res = self.client().get('/venues/100000')
+        self.assertEqual(res.status_code, 404)
+
+    def test_detail_partitions_and_limits_shows(self):
+        now = datetime.now()
+        for days in range(1, 31):
+            db.session.add(Show(venue_id=self.dueling_pianos_id, artist_id=self.wild_sax_band_id,
+                                start_time=now - timedelta(days=days)))
+        db.session.commit()
+
+        data = venue_detail(self.dueling_pianos_id, now=now, limit=5)
+        self.assertEqual(len(data['past_shows']), 5)
+        self.assertEqual(data['past_shows'][0]['start_time'], now - timedelta(days=1))
+        self.assertEqual(data['upcoming_shows'], [])
+        self.assertEqual(data['genres'], ('Classical',))
+
+        data = artist_detail(self.wild_sax_band_id, now=now, limit=None)
+        self.assertEqual((len(data['past_shows']), len(data['upcoming_shows'])), (30, 2))
+        self.assertLess(data['upcoming_shows'][0]['start_time'], data['upcoming_shows'][1]['start_time'])
+        self.assertEqual(data['upcoming_shows'][0]['venue_name'], 'Park Square Live Music & Coffee')
+
+    def test_show_pages_walk_the_keyset(self):
+        now = datetime.now()
+        for hours in range(1, 8):
+            db.session.add(Show(venue_id=self.musical_hop_id, artist_id=self.wild_sax_band_id,
+                                start_time=now + timedelta(days=1, hours=hours)))
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            shows, cursor = show_page(cursor, limit=3)
+            seen.extend(shows)
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 11)
+        self.assertEqual(len({show['id'] for show in seen}), 11)
+        self.assertEqual([show['start_time'] for show in seen], sorted(show['start_time'] for show in seen))
+        self.assertEqual([show['id'] for show in iter_shows(batch_size=4)], [show['id'] for show in seen])
+
+    def test_show_page_filters(self):
+        now = datetime.now()
+        shows, _ = show_page(upcoming_only=True)
+        self.assertEqual(len(shows), 2)
+        shows, _ = show_page(start=now - timedelta(days=2), end=now + timedelta(days=5))
+        self.assertEqual([show['artist_name'] for show in shows], ['Guns N Petals', 'The Wild Sax Band'])
+
+    def test_get_shows(self):
+        res = self.client().get('/shows?limit=2')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Next', res.data)
+
+        with self.count_queries() as statements:
+            res = self.client().get('/shows')
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn(b'Next', res.data)
+
+        res = self.client().get('/shows?cursor=not-a-cursor')
+        self.assertEqual(res.status_code, 400)
+
+    def test_stream_shows(self):
+        res = self.client().get('/shows?stream=True&upcoming=True')
+        self.assertTrue(res.is_streamed)
+        self.assertEqual(res.get_data().count(b'The Wild Sax Band'), 2)
+
+    def test_venue_ics_feed(self):
+        res = self.client().get(f'/venues/{self.park_square_id}/shows.ics')
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.is_streamed)
+        self.assertEqual(res.mimetype, 'text/calendar')
+        body = res.get_data(as_text=True)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:Guns N Petals', body)
+        self.assertIn('LOCATION:Park Square Live Music & Coffee\\, San Francisco\\, CA', body)
+        self.assertEqual(res.headers['Cache-Control'], 'no-cache')
+
+    def test_artist_json_feed(self):
+        res = self.client().get(f'/artists/{self.wild_sax_band_id}/shows.json')
+        self.assertEqual(res.status_code, 200)
+        feed = json.loads(res.get_data())
+        self.assertEqual(feed['artist_name'], 'The Wild Sax Band')
+        self.assertEqual([show['venue_id'] for show in feed['shows']], [self.park_square_id] * 2)
+        self.assertLess(feed['shows'][0]['start_time'], feed['shows'][1]['start_time'])
+
+        self.assertEqual(self.client().get('/artists/1000/shows.json').status_code, 404)
+
+    def test_feeds_answer_conditional_requests(self):
+        path = f'/artists/{self.guns_n_petals_id}/shows.json'
+        res = self.client().get(path)
+        etag, last_modified = res.headers['ETag'], res.headers['Last-Modified']
+
+        with self.count_queries() as statements:
+            res = self.client().get(path, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(self.client().get(path, headers={'If-Modified-Since': last_modified}).status_code, 304)
+
+        self.client().post('/shows/create', data={
+            'artist_id': self.guns_n_petals_id,
+            'venue_id': self.dueling_pianos_id,
+            'start_time': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+        })
+        res = self.client().get(path, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+        self.assertEqual(len(json.loads(res.get_data())['shows']), 3)
+
+    def test_editing_a_venue_changes_its_artists_feeds(self):
+        path = f'/artists/{self.wild_sax_band_id}/shows.json'
+        etag = self.client().get(path).headers['ETag']
+        self.client().post(f'/venues/{self.park_square_id}/edit', data={
+            'name': 'Park Square', 'city': 'San Francisco', 'state': 'CA', 'address': '34 Whiskey Moore Ave',
+            'phone': '415-000-1234', 'genres': ['Jazz'], 'facebook_link': '', 'image_link': '', 'website': '',
+            'seeking_talent': 'False', 'seeking_description': ''
+        })
+        res = self.client().get(path, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.get_data())['shows'][0]['venue_name'], 'Park Square')
+
+    def test_ics_lines_are_folded(self):
+        line = 'SUMMARY:' + 'Café ' * 30
+        folded = _ics_line(line)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded[:-2].split('\r\n')))
+        self.assertEqual(folded[:-2].replace('\r\n ', ''), line)
+
+    def test_api_venue_detail_uses_version_etag(self):
+        path = f'/api/v1/venues/{self.park_square_id}'
+        res = self.client().get(path)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/json')
+        self.assertFalse(res.headers['ETag'].startswith('W/'))
+        venue = res.get_json()
+        self.assertEqual(venue['name'], 'Park Square Live Music & Coffee')
+        self.assertEqual(len(venue['upcoming_shows']), 2)
+        self.assertEqual(venue['genres'], ['Classical', 'Folk', 'Jazz', 'Rock n Roll'])
+        self.assertNotIn('genre_mask', venue)
+
+        with self.count_queries() as statements:
+            res = self.client().get(path, headers={'If-None-Match': res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(len(statements), 1)
+
+        self.assertEqual(self.client().get('/api/v1/venues/1000').status_code, 404)
+
+    def test_api_artist_etag_changes_with_shows(self):
+        path = f'/api/v1/artists/{self.guns_n_petals_id}'
+        etag = self.client().get(path).headers['ETag']
+        self.client().post('/shows/create', data={
+            'artist_id': self.guns_n_petals_id,
+            'venue_id': self.dueling_pianos_id,
+            'start_time': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+        })
+        res = self.client().get(path, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['upcoming_shows'][0]['venue_name'], 'The Dueling Pianos Bar')
+
+    def test_api_lists(self):
+        res = self.client().get('/api/v1/venues')
+        areas = {(area['city'], area['state']): area['venues'] for area in res.get_json()['areas']}
+        self.assertEqual(len(areas[('San Francisco', 'CA')]), 2)
+        self.assertEqual(self.client().get('/api/v1/venues', headers={'If-None-Match': res.headers['ETag']})
+                         .status_code, 304)
+
+        artists = self.client().get('/api/v1/artists').get_json()['artists']
+        self.assertEqual([artist['name'] for artist in artists], ['Guns N Petals', 'The Wild Sax Band'])
+
+        res = self.client().get('/api/v1/shows?upcoming=True&limit=1')
+        page = res.get_json()
+        self.assertEqual(page['shows'][0]['artist_name'], 'The Wild Sax Band')
+        self.assertEqual(len(self.client().get(page['next']).get_json()['shows']), 1)
+        self.assertEqual(self.client().get('/api/v1/shows?cursor=nope').status_code, 400)
+
+    def test_format_datetime(self):
+        value = datetime(2019, 5, 21, 21, 30)
+        self.assertEqual(format_datetime(value, 'full'), 'Tuesday May, 21, 2019 at 9:30PM')
+        self.assertEqual(format_datetime('2019-05-21T21:30:00.000Z', 'medium'), 'Tue 05, 21, 2019 9:30PM')
+        self.assertEqual(format_datetimes([value, '2019-05-21 21:30:00', value], 'full'),
+                         ['Tuesday May, 21, 2019 at 9:30PM'] * 3)
+
+    def test_format_datetime_converts_aware_values_to_utc(self):
+        value = datetime(2019, 5, 21, 21, 30, tzinfo=timezone(timedelta(hours=-7)))
+        for format, pattern in (('medium', 'EE MM, dd, y h:mma'), ('long', 'long')):
+            self.assertEqual(format_datetime(value, format),
+                             babel_format_datetime(value, pattern, tzinfo=UTC, locale='en'))
+        self.assertEqual(format_datetime(value, 'medium'), 'Wed 05, 22, 2019 4:30AM')
+
+    def test_parse_datetime_is_cached(self):
+        parse_datetime.cache_clear()
+        format_datetimes(['2035-04-01 20:00:00'] * 10)
+        format_datetime('2035-04-01 20:00:00', 'full')
+        self.assertEqual(parse_datetime.cache_info().misses, 1)
+
+    def write_import_file(self, name, content):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def test_import_venues_csv(self):
+        path = self.write_import_file('venues.csv', '\n'.join([
+            'name,city,state,address,phone,image_link,genres,seeking_talent',
+            'Blue Note,New York,NY,131 W 3rd St,212-475-8592,https://example.com/1.jpg,"Jazz, Blues",True',
+            'No Genres,New York,NY,1 Main St,212-000-0000,https://example.com/2.jpg,,False',
+            'Bad Phone,New York,NY,2 Main St,12345,https://example.com/3.jpg,Jazz,False',
+            'Village Vanguard,New York,NY,178 7th Ave S,212-255-4037,https://example.com/4.jpg,Jazz,False',
+        ]))
+
+        self.assertEqual(import_file('venues', path, batch_size=2), (2, 2))
+
+        results = browse(Venue, ['Jazz'], state='NY')
+        self.assertEqual([venue['name'] for venue in results['data']], ['Blue Note', 'Village Vanguard'])
+        blue_note = Venue.query.filter_by(name='Blue Note').one()
+        self.assertTrue(blue_note.seeking_talent)
+        self.assertEqual(sorted(genre.name for genre in blue_note.genre_list), ['Blues', 'Jazz'])
+        self.assertEqual(search(Venue, 'vanguard')['count'], 1)
+        with open(path + '.rejects.ndjson') as file:
+            rejects = [json.loads(line) for line in file]
+        self.assertEqual([reject['row_number'] for reject in rejects], [2, 3])
+        self.assertIn('phone', rejects[1]['errors'])
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_import_shows_ndjson_updates_counters(self):
+        start_time = (datetime.now() + timedelta(days=20)).strftime('%Y-%m-%d %H:%M:%S')
+        path = self.write_import_file('shows.ndjson', '\n'.join(json.dumps(row) for row in [
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.guns_n_petals_id, 'start_time': start_time},
+            {'venue_id': self.dueling_pianos_id, 'artist_id': 100000, 'start_time': start_time},
+            {'venue_id': self.dueling_pianos_id, 'artist_id': self.guns_n_petals_id, 'start_time': 'tomorrow'},
+        ]))
+
+        self.assertEqual(import_file('shows', path), (1, 2))
+
+        venue = db.session.get(Venue, self.dueling_pianos_id)
+        self.assertEqual(venue.upcoming_shows_count, 1)
+        self.assertEqual(Show.query.filter_by(venue_id=self.dueling_pianos_id).count(), 1)
+
+    def test_import_resumes_from_checkpoint(self):
+        path = self.write_import_file('artists.ndjson', '\n'.join(json.dumps(row) for row in [
+            {'name': f'Artist {i}', 'city': 'Austin', 'state': 'TX', 'phone': '512-000-0000', 'genres': ['Funk']}
+            for i in range(5)
+        ]))
+        with open(path + '.checkpoint', 'w') as file:
+            json.dump({'rows': 3, 'imported': 3, 'rejected': 0}, file)
+
+        result = self.app.test_cli_runner().invoke(args=['fyyur', 'import', 'artists', path, '--resume'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Imported 5 artists', result.output)
+        self.assertEqual(Artist.query.filter(Artist.name.like('Artist %')).count(), 2)
+
+    def test_pages_are_cached_until_a_write(self):
+        self.client().get(f'/venues/{self.park_square_id}')
+        with self.count_queries() as statements:
+            res = self.client().get(f'/venues/{self.park_square_id}')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(statements, [])
+
+        # Renaming an artist invalidates the pages of the venues they played at.
+        self.client().post(f'/artists/{self.wild_sax_band_id}/edit', data={
+            'name': 'The Wilder Sax Band', 'city': 'San Francisco', 'state': 'CA', 'phone': '',
+            'genres': 'Jazz', 'facebook_link': '', 'image_link': '', 'website': '',
+            'seeking_venue': 'False', 'seeking_description': ''
+        })
+        self.client().get('/')  # consume the flash message
+        res = self.client().get(f'/venues/{self.park_square_id}')
+        self.assertIn(b'The Wilder Sax Band', res.data)
+        res = self.client().get(f'/venues/{self.musical_hop_id}')
+        self.assertNotIn(b'Sax Band', res.data)
+
+    def test_cached_skips_requests_with_flash_messages(self):
+        with self.app.test_request_context():
+            self.assertEqual(cached('page', ['venues'], lambda: 'first'), 'first')
+            self.assertEqual(cached('page', ['venues'], lambda: 'second'), 'first')
+            bump('venues')
+            self.assertEqual(cached('page', ['venues'], lambda: 'third'), 'third')
+            flash('Saved!')
+            self.assertEqual(cached('page', ['venues'], lambda: 'fourth'), 'fourth')
+
+    def test_file_cache_is_shared_and_expires(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer, reader = FileCache(directory), FileCache(directory)
+            writer.set('page', 'Café\nmenu')
+            writer.set('short', 'lived', ttl=-1)
+            self.assertEqual(reader.get('page'), 'Café\nmenu')
+            self.assertIsNone(reader.get('short'))
+            self.assertIsNone(reader.get('missing'))
+            reader.clear()
+            self.assertIsNone(writer.get('page'))
+
+    def test_file_cache_sweeps_expired_and_oldest_pages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # No random sweeps while the entries are set up.
+            cache = FileCache(directory, max_entries=2, sweep_every=2 ** 62)
+            cache.set_version('venues', 'v1')
+            cache.set('expired', 'page', ttl=-1)
+            for index, key in enumerate(('old', 'newer', 'newest')):
+                cache.set(key, 'page', ttl=60)
+                os.utime(cache._path(directory, key), (index, index))
+
+            self.assertEqual(cache.sweep(), 2)
+            self.assertEqual((cache.get('old'), cache.get('newer'), cache.get('newest')), (None, 'page', 'page'))
+            self.assertEqual(cache.get_version('venues'), 'v1')
+
+    def test_versions_survive_page_eviction(self):
+        cache = MemoryCache(maxsize=1)
+        self.app.extensions['page_cache'], original = cache, self.app.extensions['page_cache']
+        try:
+            with self.app.test_request_context():
+                self.assertEqual(cached('page', ['venues'], lambda: 'first'), 'first')
+                bump('venues')
+                token = cache.get_version('venues')
+                for index in range(3):
+                    cache.set(f'other:{index}', 'page')
+                self.assertEqual(cache.get_version('venues'), token)
+                self.assertEqual(cached('page', ['venues'], lambda: 'second'), 'second')
+        finally:
+            self.app.extensions['page_cache'] = original
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('a', '1')
+        cache.set('b', '2')
+        cache.get('a')
+        cache.set('c', '3')
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), ('1', None, '3'))
+
+    def test_server_timing_header(self):
+        res = self.client().get('/venues')
+        self.assertIn('desc="1 queries"', res.headers['Server-Timing'])
+        self.assertIn('app;dur=', res.headers['Server-Timing'])
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(fingerprint('SELECT * FROM "Venue"\n WHERE id IN (?, ?, ?) AND name = \'Hop\' LIMIT 10'),
+                         'SELECT * FROM "Venue" WHERE id IN (?) AND name = ? LIMIT ?')
+        self.assertEqual(fingerprint('SELECT 1 WHERE id = %(id_1)s'), fingerprint('SELECT 2 WHERE id = %(id_2)s'))
+
+    def test_repeated_statements_are_flagged(self):
+        self.app.extensions['sql_stats'].clear()
+        with self.app.test_request_context('/venues'):
+            self.app.preprocess_request()
+            for venue_id in range(1, 7):
+                db.session.query(Venue.name).filter(Venue.id == venue_id).all()
+            with self.assertLogs(self.app.logger, 'WARNING') as logs:
+                self.app.do_teardown_request()
+
+        self.assertIn('Possible N+1 in venues: 6 x SELECT', logs.output[0])
+        stats = self.app.extensions['sql_stats'].snapshot()['venues']
+        self.assertEqual((stats['requests'], stats['queries'], stats['n_plus_one_requests']), (1, 6, 1))
+
+    def test_sql_stats_endpoint(self):
+        self.assertEqual(self.client().get('/admin/sql-stats').status_code, 404)
+        self.app.config['ADMIN_TOKEN'] = 'secret'
+        try:
+            self.client().delete('/admin/sql-stats', headers={'X-Admin-Token': 'secret'})
+            self.client().get('/artists')
+            self.assertEqual(self.client().get('/admin/sql-stats').status_code, 403)
+            res = self.client().get('/admin/sql-stats', headers={'X-Admin-Token': 'secret'})
+            self.assertEqual(res.json['artists']['queries'], 1)
+            self.assertEqual(res.json['artists']['slowest_statements'][0]['count'], 1)
+        finally:
+            self.app.config['ADMIN_TOKEN'] = None
+
+    def test_engine_options_follow_pool_settings(self):
+        config = dict(self.app.config, DATABASE_STATEMENT_TIMEOUT=5000)
+        self.assertEqual(engine_options('sqlite://', config), {})
+
+        options = engine_options('postgresql://localhost/fyyur', config)
+        self.assertIs(options['poolclass'], TimedQueuePool)
+        self.assertEqual((options['pool_size'], options['max_overflow']), (5, 10))
+        self.assertEqual(options['connect_args'], {'options': '-c statement_timeout=5000'})
+
+        config['DATABASE_PGBOUNCER'] = True
+        self.assertEqual(engine_options('postgresql+psycopg://localhost/fyyur', config)['connect_args'],
+                         {'prepare_threshold': None})
+        self.assertEqual(engine_options('postgresql+psycopg2://localhost/fyyur', config)['connect_args'], {})
+
+    def test_pool_settings_are_shared(self):
+        settings = pool_settings({'DATABASE_POOL_SIZE': '2', 'DATABASE_PGBOUNCER': 'true'})
+        self.assertEqual((settings['DATABASE_POOL_SIZE'], settings['DATABASE_MAX_OVERFLOW']), (2, 10))
+        self.assertTrue(settings['DATABASE_PGBOUNCER'])
+        self.assertIs(shared_engine_options('postgresql://localhost/trivia', settings)['poolclass'], QueuePool)
+        self.assertEqual(shared_engine_options('sqlite:///database.db', settings)['connect_args'],
+                         {'check_same_thread': False})
+
+    def test_timed_pool_counts_waits_overflows_and_timeouts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f'sqlite:///{directory}/pool.db', poolclass=TimedQueuePool, pool_size=1,
+                                   max_overflow=1, pool_timeout=0.05)
+            first, second = engine.connect(), engine.connect()
+            with self.assertRaises(exc.TimeoutError):
+                engine.connect()
+            second.close()
+            engine.connect().close()
+            first.close()
+
+            metrics = engine.pool.metrics()
+            self.assertEqual((metrics['checkouts'], metrics['overflows'], metrics['timeouts']), (3, 1, 1))
+            self.assertEqual((metrics['checked_out'], metrics['overflow']), (0, 0))
+            self.assertGreaterEqual(metrics['max_wait_ms'], 0)
+            engine.dispose()
+
+    def test_pool_stats_endpoint(self):
+        self.assertEqual(self.client().get('/admin/pool-stats').status_code, 404)
+        self.app.config['ADMIN_TOKEN'] = 'secret'
+        try:
+            res = self.client().get('/admin/pool-stats', headers={'X-Admin-Token': 'secret'})
+            self.assertEqual(res.status_code, 200)
+            self.assertIn('primary', res.json)
+        finally:
+            self.app.config['ADMIN_TOKEN'] = None
+
+    def test_generate_skews_cities_and_spreads_dates(self):
+        now = datetime.now()
+        counts = generate(venues=200, artists=100, shows=1000, seed=7, now=now)
+        self.assertEqual(counts, {'venues': 200, 'artists': 100, 'shows': 1000})
+
+        top_city = db.session.query(Venue.city, db.func.count(Venue.id)).group_by(Venue.city).order_by(
+            db.func.count(Venue.id).desc()).first()
+        self.assertEqual(top_city[0], 'New York')
+        self.assertGreater(top_city[1], 200 / 20 * 2)
+        upcoming = Show.query.filter(Show.start_time > now).count()
+        self.assertTrue(150 < upcoming < 350)
+        self.assertEqual(db.session.query(db.func.sum(Venue.upcoming_shows_count)).scalar(), upcoming)
+        self.assertTrue(search(Venue, 'Hall')['data'])
+
+    def test_benchmark_reports_every_route(self):
+        report = benchmark(requests=3, writes=True, echo=lambda line: None)
+        self.assertEqual(set(report['routes']) - {'shows_upcoming'},
+                         {rule.endpoint for rule in self.app.url_map.iter_rules()} -
+                         {'static', 'delete_venue', 'delete_artist', 'sql_stats', 'pool_stats'})
+        for result in report['routes'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(report['dataset'], {'venues': 3, 'artists': 2, 'shows': 4})
+
+    def test_reads_go_to_replica_until_user_writes(self):
+        replica = create_engine('sqlite://', poolclass=StaticPool)
+        db.metadata.create_all(replica)
+        with replica.begin() as connection:
+            connection.execute(Venue.__table__.insert(), {'name': 'Replica Hall', 'city': 'Austin', 'state': 'TX'})
+        db.engines['replica'] = replica
+        self.app.config['READ_REPLICA_BINDS'] = ['replica']
+        try:
+            client = self.client()
+            res = client.get('/venues/browse')
+            self.assertIn(b'Replica Hall', res.data)
+            self.assertNotIn(b'The Musical Hop', res.data)
+            # Pages that go into the page cache are rendered from the primary.
+            self.assertNotIn(b'Replica Hall', client.get('/venues').data)
+
+            # Neither read-only POSTs nor failed writes pin the user to the primary.
+            client.post('/venues/search', data={'search_term': 'Hall'})
+            client.delete('/venues/100000')
+            self.assertIn(b'Replica Hall', client.get('/venues/browse').data)
+
+            client.delete(f'/venues/{self.dueling_pianos_id}')
+            res = client.get('/venues/browse')
+            self.assertIn(b'The Musical Hop', res.data)
+
+            self.app.config['READ_YOUR_WRITES_SECONDS'] = 0
+            res = client.get('/venues/browse')
+            self.assertIn(b'Replica Hall', res.data)
+        finally:
+            self.app.config['READ_REPLICA_BINDS'] = []
+            self.app.config['READ_YOUR_WRITES_SECONDS'] = 5
+            db.session.remove()
+            del db.engines['replica']
+            replica.dispose()
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
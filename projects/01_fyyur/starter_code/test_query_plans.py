@@ -0,0 +1,166 @@
+import json
+import os
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import app
+from archive import archive_shows
+from bookings import check_bookings, find_conflicts
+from counters import forget_shows, reconcile, roll_over
+from deletion import delete_entity
+from models import db, Venue, Artist, Show
+from show_listing import encode_cursor
+
+VENUES = 500
+ARTISTS = 500
+SHOWS = 20000
+# Tables a guarded query may only reach through an index.
+GUARDED_TABLES = ('Show', 'ShowArchive', 'Venue', 'Artist')
+
+
+def seq_scans(connection, statement, parameters):
+    # Returns the guarded tables the database would read in full to run statement.
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes, scans = [plan[0]['Plan']], []
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in GUARDED_TABLES:
+                scans.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return scans
+
+    # SQLite reports a full table scan as "SCAN <table>" without "USING ... INDEX".
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return [detail.split()[1] for *_, detail in rows
+            if detail.startswith('SCAN ') and 'INDEX' not in detail and detail.split()[1] in GUARDED_TABLES]
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Runs EXPLAIN on every statement a route issues against a large dataset and
+    fails if one of them reads a Show, Venue or Artist table sequentially."""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['TESTING'] = True
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.create_all()
+
+        now = datetime.now()
+        db.session.execute(Venue.__table__.insert(), [
+            {'name': f'Venue {i}', 'city': f'City {i % 50}', 'state': f'S{i % 10}'} for i in range(VENUES)])
+        db.session.execute(Artist.__table__.insert(), [
+            {'name': f'Artist {i}', 'city': f'City {i % 50}', 'state': f'S{i % 10}'} for i in range(ARTISTS)])
+        db.session.execute(Show.__table__.insert(), [{
+            'venue_id': i % VENUES + 1,
+            'artist_id': i * 7 % ARTISTS + 1,
+            'start_time': now + timedelta(hours=i - SHOWS // 2),
+            'is_upcoming': i >= SHOWS // 2
+        } for i in range(SHOWS)])
+        db.session.commit()
+        archive_shows(now)
+        reconcile(now)
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client
+        app.extensions['page_cache'].clear()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    @contextmanager
+    def assert_no_seq_scans(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertTrue(statements)
+        with db.engine.connect() as connection:
+            for statement, parameters in statements:
+                self.assertEqual(seq_scans(connection, statement, parameters), [], statement)
+
+    def test_home_page(self):
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get('/').status_code, 200)
+
+    def test_venues(self):
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get('/venues').status_code, 200)
+
+    def test_show_venue(self):
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get('/venues/42').status_code, 200)
+
+    def test_show_artist(self):
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get('/artists/42').status_code, 200)
+
+    def test_shows(self):
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get('/shows').status_code, 200)
+
+    def test_shows_next_page(self):
+        cursor = encode_cursor(datetime.now(), SHOWS // 2)
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get(f'/shows?cursor={cursor}').status_code, 200)
+
+    def test_upcoming_shows(self):
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get('/shows?upcoming=True').status_code, 200)
+
+    def test_browse_venues_by_area(self):
+        with self.assert_no_seq_scans():
+            self.assertEqual(self.client().get('/venues/browse?state=S3&city=City+13').status_code, 200)
+
+    def test_roll_over(self):
+        with self.assert_no_seq_scans():
+            roll_over(now=datetime.now() - timedelta(days=SHOWS))
+
+    def test_delete_venue(self):
+        with self.assert_no_seq_scans():
+            delete_entity(Venue, 7, batch_size=10)
+
+    def test_forget_venue_shows(self):
+        with self.assert_no_seq_scans():
+            forget_shows(Venue, 42)
+            Show.query.filter_by(venue_id=42).delete()
+
+    def test_find_conflicts(self):
+        with self.assert_no_seq_scans():
+            find_conflicts(42, 42, datetime.now() - timedelta(days=100))
+
+    def test_check_bookings(self):
+        now = datetime.now()
+        proposals = [{'venue_id': i + 1, 'artist_id': i * 3 + 1, 'start_time': now + timedelta(days=i)}
+                     for i in range(50)]
+        with self.assert_no_seq_scans():
+            check_bookings(proposals)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Venue, Show, VenueTrend, TrendWindow, live, live_shows
+
+TRENDING_DAYS = 7
+TRENDING_LIMIT = 10
+
+
+# ----------------------------------------------------------------------------#
+# Trending venues.
+# ----------------------------------------------------------------------------#
+
+# VenueTrend holds, per venue, the number of shows between midnight today and
+# TRENDING_DAYS later, so the home page reads the top venues straight off
+# ix_VenueTrend_shows_venue_id instead of aggregating Show. Writers adjust it by
+# the shows they add or remove (record_trends, forget_*_trend). When the day
+# changes the roll-over job recounts the new window from the start_time index
+# (roll_trends); reconcile always recounts.
+
+def _window_start(now):
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def trend_window():
+    # Returns (starts, ends) of the window VenueTrend counts, or None before the first count.
+    starts = db.session.query(TrendWindow.starts).filter(TrendWindow.id == 1).scalar()
+    return (starts, starts + timedelta(days=TRENDING_DAYS)) if starts else None
+
+
+def _add(venue_id, count):
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(VenueTrend).values(venue_id=venue_id, shows=count)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[VenueTrend.venue_id], set_={'shows': VenueTrend.shows + statement.excluded.shows}))
+
+
+def record_trends(shows, delta=1):
+    # Counts (venue_id, start_time) pairs of added shows, or of removed ones with
+    # delta=-1, that fall in the window. Call before committing.
+    window = trend_window()
+    if window is None:
+        return
+    counts = Counter(venue_id for venue_id, start_time in shows if window[0] <= start_time < window[1])
+    for venue_id, count in counts.items():
+        _add(venue_id, count * delta)
+
+
+def forget_venue_trend(venue_id):
+    db.session.query(VenueTrend).filter(VenueTrend.venue_id == venue_id).delete(synchronize_session=False)
+
+
+def forget_artist_trend(artist_id):
+    # Takes the artist's shows in the window off their venues.
+    window = trend_window()
+    if window is None:
+        return
+    counts = db.session.query(Show.venue_id, db.func.count(Show.id)).filter(
+        Show.artist_id == artist_id, Show.start_time >= window[0], Show.start_time < window[1],
+        live_shows(Show, [Venue])
+    ).group_by(Show.venue_id)
+    for venue_id, count in counts.all():
+        _add(venue_id, -count)
+
+
+def rebuild_trends(now=None):
+    # Recounts VenueTrend for the window starting today. Call before committing.
+    starts = _window_start(now or datetime.now())
+    db.session.query(VenueTrend).delete(synchronize_session=False)
+    db.session.execute(VenueTrend.__table__.insert().from_select(
+        ['venue_id', 'shows'],
+        db.select(Show.venue_id, db.func.count(Show.id)).where(
+            Show.start_time >= starts, Show.start_time < starts + timedelta(days=TRENDING_DAYS), live_shows(Show)
+        ).group_by(Show.venue_id)))
+    if db.session.query(TrendWindow).filter(TrendWindow.id == 1).update({TrendWindow.starts: starts}) == 0:
+        db.session.add(TrendWindow(id=1, starts=starts))
+
+
+def roll_trends(now=None):
+    # Rebuilds VenueTrend if the day changed since it was counted. Returns whether it did.
+    now = now or datetime.now()
+    window = trend_window()
+    if window is not None and window[0] == _window_start(now):
+        return False
+    rebuild_trends(now)
+    return True
+
+
+def trending_venues(limit=TRENDING_LIMIT):
+    # The limit venues with the most shows in the window, busiest first.
+    rows = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.image_link, VenueTrend.shows
+    ).join(Venue, Venue.id == VenueTrend.venue_id).filter(VenueTrend.shows > 0, live(Venue)).order_by(
+        VenueTrend.shows.desc(), VenueTrend.venue_id.desc()
+    ).limit(limit)
+    return [{
+        "id": venue_id,
+        "name": name,
+        "city": city,
+        "state": state,
+        "image_link": image_link,
+        "num_shows": shows
+    } for venue_id, name, city, state, image_link, shows in rows]
@@ -1,16 +1,66 @@
-import random
+import base64
+import binascii
+import json
 
 from flask import Flask, request, jsonify, abort
 from flask_cors import CORS
-from models import setup_db, Category, Question
+from sqlalchemy import func
+from models import setup_db, db, CategoryRegistry, Question, \
+    QuestionSampler
+from question_search import QuestionSearch
+from quiz_sessions import MemorySessionStore, QuizSession, new_session_id
 
 QUESTIONS_PER_PAGE = 10
+MAX_QUESTIONS_PER_PAGE = 100
+
+'''
+encode_cursor(question_id) / decode_cursor(cursor)
+    the opaque cursor handed out as next_cursor by GET /questions: the id of
+    the last question on the page, base64 encoded. decode_cursor raises
+    ValueError for anything it did not produce.
+'''
+
+
+def encode_cursor(question_id):
+    return base64.urlsafe_b64encode(str(question_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        question_id = int(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('invalid cursor')
+    if question_id < 0:
+        raise ValueError('invalid cursor')
+    return question_id
+
+
+'''
+json_response(payload, **fragments)
+    a JSON response of payload with already serialized JSON values (such as
+    CategoryRegistry.json()) spliced in under the given keys.
+'''
+
+
+def json_response(payload, **fragments):
+    members = [json.dumps(payload)[1:-1]] + [
+        '{}: {}'.format(json.dumps(key), fragment)
+        for key, fragment in fragments.items()]
+    return Flask.response_class(
+        '{' + ', '.join(member for member in members if member) + '}',
+        mimetype='application/json')
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    app.config.from_mapping(test_config or {})
     setup_db(app)
+    categories = CategoryRegistry()
+    sampler = QuestionSampler()
+    question_index = QuestionSearch()
+    quiz_sessions = app.config.get('QUIZ_SESSION_STORE') or \
+        MemorySessionStore()
 
     '''
     @DONE: Set up CORS. Allow '*' for origins. Delete the sample route after
@@ -37,13 +87,7 @@ def create_app(test_config=None):
 
     @app.route('/categories')
     def get_categories():
-        categories = {item['id']: item['type'] for item in
-                      [category.format() for category in Category.query.all()]}
-
-        return jsonify({
-            "success": True,
-            "categories": categories
-        })
+        return json_response({"success": True}, categories=categories.json())
 
     '''
     @DONE:
@@ -59,35 +103,57 @@ def create_app(test_config=None):
     Clicking on the page numbers should update the questions.
     '''
 
-    def paginate_questions(page, selection):
-        start = (page - 1) * QUESTIONS_PER_PAGE
-        end = start + QUESTIONS_PER_PAGE
-
-        questions = [question.format() for question in selection]
-        current_questions = questions[start:end]
+    '''
+    Pages are cut in SQL: ?page=N is a LIMIT/OFFSET query in id order, and
+    total_questions a separate COUNT, so only the questions on the page are
+    loaded and formatted. Deep pages should follow next_cursor instead
+    (?cursor=...), which seeks past the last id seen through the primary key
+    rather than reading and skipping every earlier row. ?per_page= takes 1 to
+    MAX_QUESTIONS_PER_PAGE questions.
+    '''
 
-        return current_questions
+    def paginate_questions(query, page, per_page, cursor):
+        query = query.order_by(Question.id)
+        if cursor is not None:
+            query = query.filter(Question.id > decode_cursor(cursor))
+        else:
+            query = query.offset((page - 1) * per_page)
+        # One extra row tells whether there is a next page.
+        questions = query.limit(per_page + 1).all()
+        next_cursor = encode_cursor(questions[per_page - 1].id) \
+            if len(questions) > per_page else None
+        return [question.format() for question in questions[:per_page]], \
+            next_cursor
 
     @app.route('/questions')
     def get_questions():
         page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', QUESTIONS_PER_PAGE, type=int)
+        cursor = request.args.get('cursor')
         current_category = request.args.get('category')
-        questions = Question.query.order_by(Question.id).filter_by(
-            category=current_category).all() if current_category is not None\
-            else Question.query.order_by(Question.id).all()
-        questions_in_page = paginate_questions(page, questions)
-        categories = {item['id']: item['type'] for item in
-                      [category.format() for category in Category.query.all()]}
-        if len(questions_in_page) is 0:
+        if page < 1 or not 1 <= per_page <= MAX_QUESTIONS_PER_PAGE:
+            abort(400)
+
+        query = Question.query
+        total = db.session.query(func.count(Question.id))
+        if current_category is not None:
+            query = query.filter(Question.category == current_category)
+            total = total.filter(Question.category == current_category)
+        try:
+            questions_in_page, next_cursor = paginate_questions(
+                query, page, per_page, cursor)
+        except ValueError:
+            abort(400)
+        if len(questions_in_page) == 0:
             abort(404)
 
-        return jsonify({
+        return json_response({
             "success": True,
             "questions": questions_in_page,
-            "total_questions": len(questions),
-            "categories": categories,
+            "total_questions": total.scalar(),
+            "next_cursor": next_cursor,
             "current_category": current_category
-        })
+        }, categories=categories.json())
 
     '''
     @DONE:
@@ -156,16 +222,37 @@ def create_app(test_config=None):
     Try using the word "title" to start.
     '''
 
+    '''
+    Search matches the words of searchTerm in question and answer text, best
+    matches first, and takes optional category, difficulty, page and per_page
+    fields. An empty searchTerm lists every question matching the filters.
+    '''
+
     @app.route('/questions/search', methods=['POST'])
     def question_search():
-        search_term = request.get_json()['searchTerm']
-        questions = Question.query.filter(
-            Question.question.like(f"%{search_term}%")).all()
+        body = request.get_json()
+        try:
+            search_term = body['searchTerm']
+            category = body.get('category')
+            difficulty = body.get('difficulty')
+            category = str(int(category)) if category is not None else None
+            difficulty = int(difficulty) if difficulty is not None else None
+            page = int(body.get('page', 1))
+            per_page = int(body.get('per_page', QUESTIONS_PER_PAGE))
+        except (KeyError, TypeError, ValueError):
+            abort(400)
+        if not isinstance(search_term, str) or page < 1 or \
+                not 1 <= per_page <= MAX_QUESTIONS_PER_PAGE:
+            abort(400)
+
+        questions, total = question_index.search(
+            search_term, category, difficulty, page, per_page)
         return jsonify({
             "success": True,
             "questions": [item.format() for item in questions],
-            "total_questions": len(questions),
-            "current_category": None
+            "total_questions": total,
+            "page": page,
+            "current_category": category
         })
 
     '''
@@ -203,21 +290,77 @@ def create_app(test_config=None):
     @app.route('/quizzes', methods=['POST'])
     def get_quiz():
         body = request.get_json()
-        quiz_category = body['quiz_category']['id']
-        previous_questions = body['previous_questions']
-        questions = Question.query.order_by(Question.id).filter_by(
-            category=quiz_category).all() if quiz_category is not 0 else \
-            Question.query.order_by(Question.id).all()
+        try:
+            quiz_category = int(body['quiz_category']['id'])
+            previous_questions = set(body['previous_questions'])
+        except (KeyError, TypeError, ValueError):
+            abort(400)
+        # Category 0 is "All".
+        question = sampler.sample(
+            str(quiz_category) if quiz_category else None, previous_questions)
 
-        qlist = []
+        return jsonify({
+            "success": True,
+            "question": question.format() if question is not None else None
+        })
+
+    '''
+    Quiz sessions keep the questions played on the server, so a client only
+    sends the session id: POST /quizzes/sessions with the quiz_category
+    starts one, and every POST /quizzes/sessions/<id>/next returns a question
+    the session has not seen yet. The seen questions are a SeenSet bitset in
+    the QUIZ_SESSION_STORE, which forgets idle sessions. Once random draws
+    keep hitting seen questions, the session also keeps the ids it has left,
+    so every draw stays a constant amount of work; questions added after
+    that are not offered to it.
+    '''
 
-        for q in questions:
-            if q.id not in previous_questions:
-                qlist.append(q.format())
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def create_quiz_session():
+        body = request.get_json()
+        try:
+            quiz_category = int(body['quiz_category']['id'])
+        except (KeyError, TypeError, ValueError):
+            abort(400)
+        session_id = new_session_id()
+        quiz_sessions.set(session_id, QuizSession(
+            str(quiz_category) if quiz_category else None).dumps())
+
+        return jsonify({
+            "success": True,
+            "session_id": session_id,
+            "quiz_category": quiz_category
+        }), 201
+
+    @app.route('/quizzes/sessions/<session_id>/next', methods=['POST'])
+    def next_quiz_question(session_id):
+        # Retried when a concurrent request on the same session saved first,
+        # so both never get the same question.
+        while True:
+            data = quiz_sessions.get(session_id)
+            if data is None:
+                abort(404)
+            session = QuizSession.loads(data)
+            if session.remaining is None:
+                question = sampler.draw(session.category, session.seen)
+                if question is None:
+                    # Most of the category was played: from now on draw from
+                    # the questions left, kept in the session.
+                    session.remaining = sampler.remaining(session.category,
+                                                          session.seen)
+            if session.remaining is not None:
+                question = sampler.pop(session.remaining)
+            if question is not None:
+                session.seen.add(question.id)
+            # Saved either way, which keeps the session alive.
+            if quiz_sessions.compare_and_set(session_id, data,
+                                             session.dumps()):
+                break
 
         return jsonify({
             "success": True,
-            "question": random.choice(qlist) if len(qlist) is not 0 else None
+            "question": question.format() if question is not None else None,
+            "questions_played": len(session.seen)
         })
 
     '''
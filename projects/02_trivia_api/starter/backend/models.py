@@ -1,21 +1,52 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, Index, DDL, event, func
+
+# pool_config.py is shared with the other backends, in projects/.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, os.pardir, os.pardir))
+from pool_config import engine_options, pool_settings
 
 database_user = 'tuncerm'
 database_name = "trivia"
 database_path = "postgres://{}@{}/{}".format(database_user,'localhost:5432', database_name)
 
+# How often, in seconds, a worker checks whether its cached tables changed.
+VERSION_TTL = 1
+# Versions of a table whose changed row is kept, so that a cache at most this
+# many versions behind can update just those rows instead of rebuilding.
+CHANGE_LOG_SIZE = 1000
+# Random draws that may hit excluded questions before the sampler falls back
+# to listing the ones left in the category.
+SAMPLE_ATTEMPTS = 20
+
 db = SQLAlchemy()
+# This process' VersionedCache instances, by version_name.
+caches = defaultdict(weakref.WeakSet)
 
 '''
 setup_db(app)
-    binds a flask application and a SQLAlchemy service
+    binds a flask application and a SQLAlchemy service, with the connection
+    pool sized from the same DATABASE_* environment variables as Fyyur's
 '''
 
 
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+        database_path, pool_settings())
     db.app = app
     db.init_app(app)
     db.create_all()
@@ -29,6 +60,8 @@ Question
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    # Serves the per-category pages of GET /questions in id order.
+    __table_args__ = (Index('ix_questions_category_id', 'category', 'id'),)
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
@@ -44,12 +77,16 @@ class Question(db.Model):
 
     def insert(self):
         db.session.add(self)
+        db.session.flush()
+        bump_version('questions', self.id)
         db.session.commit()
 
     def update(self):
+        bump_version('questions', self.id)
         db.session.commit()
 
     def delete(self):
+        bump_version('questions', self.id)
         db.session.delete(self)
         db.session.commit()
 
@@ -63,6 +100,25 @@ class Question(db.Model):
         }
 
 
+'''
+search_vector
+    the full-text search document of a question: its question text weighted
+    'A' and its answer 'B'. ix_questions_search is a GIN index on the same
+    expression, created with the table on Postgres (and in trivia.psql).
+'''
+
+search_vector = func.setweight(
+    func.to_tsvector('english', func.coalesce(Question.question, '')), 'A'
+).op('||')(func.setweight(
+    func.to_tsvector('english', func.coalesce(Question.answer, '')), 'B'))
+
+event.listen(Question.__table__, 'after_create', DDL(
+    "CREATE INDEX ix_questions_search ON questions USING gin "
+    "((setweight(to_tsvector('english', coalesce(question, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(answer, '')), 'B')))"
+).execute_if(dialect='postgresql'))
+
+
 '''
 Category
 
@@ -78,8 +134,260 @@ class Category(db.Model):
     def __init__(self, type):
         self.type = type
 
+    def insert(self):
+        db.session.add(self)
+        bump_version('categories')
+        db.session.commit()
+
+    def update(self):
+        bump_version('categories')
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self)
+        bump_version('categories')
+        db.session.commit()
+
     def format(self):
         return {
             'id': self.id,
             'type': self.type
         }
+
+
+'''
+Version
+    a version stamp per cached table, bumped in the same transaction as every
+    write to that table, so that every worker can tell its copy is stale.
+'''
+
+
+class Version(db.Model):
+    __tablename__ = 'versions'
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+
+
+def current_version(name):
+    return db.session.query(Version.version).filter(
+        Version.name == name).scalar() or 0
+
+
+def bump_version(name, row_id=None):
+    if not Version.query.filter(Version.name == name).update(
+            {Version.version: Version.version + 1},
+            synchronize_session=False):
+        db.session.add(Version(name=name, version=1))
+    if row_id is not None:
+        # The version row stays locked until commit, so this is our version.
+        version = current_version(name)
+        db.session.add(Change(name=name, version=version, row_id=row_id))
+        Change.query.filter(
+            Change.name == name,
+            Change.version <= version - CHANGE_LOG_SIZE).delete(
+            synchronize_session=False)
+    db.session.info.setdefault('bumped_versions', set()).add(name)
+
+
+'''
+Change
+    the row that each of the last CHANGE_LOG_SIZE versions of a table changed,
+    when the write passed one to bump_version().
+'''
+
+
+class Change(db.Model):
+    __tablename__ = 'changes'
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, primary_key=True)
+    row_id = Column(Integer, nullable=False)
+
+
+def changed_rows(name, since, until):
+    # The ids of the rows changed by versions since + 1 to until of a table,
+    # or None unless every one of those versions logged its row.
+    if not 0 < until - since <= CHANGE_LOG_SIZE:
+        return None
+    changes = db.session.query(Change.version, Change.row_id).filter(
+        Change.name == name, Change.version > since,
+        Change.version <= until).all()
+    if len(changes) != until - since:
+        return None
+    return {row_id for _, row_id in changes}
+
+
+'''
+expire_caches(session)
+    once a transaction that bumped versions commits, makes this process'
+    caches of those tables check their version on their next read, so a
+    worker serves its own writes at once rather than up to VERSION_TTL seconds
+    later. Other workers still see them within VERSION_TTL.
+'''
+
+
+@event.listens_for(db.session, 'after_commit')
+def expire_caches(session):
+    for name in session.info.pop('bumped_versions', ()):
+        for cache in list(caches[name]):
+            cache.expire()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_bumped_versions(session):
+    session.info.pop('bumped_versions', None)
+
+
+'''
+VersionedCache
+    an in-memory snapshot of a table, built by build(). At most once per
+    VERSION_TTL seconds, and on the next read after this process commits a
+    write to the table, it reads the table's version stamp (a primary key
+    lookup). If any worker changed the table, a cache whose update() can
+    patch the snapshot with the rows changed gets their ids from the change
+    log; others, and caches too far behind the log, rebuild the snapshot.
+    Snapshots are only changed under lock.
+'''
+
+
+class VersionedCache(ABC):
+    version_name = None
+
+    def __init__(self, ttl=VERSION_TTL):
+        self.ttl = ttl
+        self.version = None
+        self.checked = 0
+        self.snapshot = None
+        self.lock = threading.Lock()
+        caches[self.version_name].add(self)
+
+    @abstractmethod
+    def build(self):
+        '''Returns the snapshot served until the table's version changes.'''
+
+    def update(self, snapshot, row_ids):
+        '''Updates snapshot in place for the rows row_ids changed, or returns
+        False to have it rebuilt instead.'''
+        return False
+
+    def expire(self):
+        # Checks the version on the next read, whatever the ttl.
+        self.checked = float('-inf')
+
+    def _load(self):
+        now = time.monotonic()
+        if self.version is not None and now - self.checked < self.ttl:
+            return self.snapshot
+        # The stamp is read first: a write landing in between makes the next
+        # check rebuild again, rather than pinning a stale snapshot.
+        version = current_version(self.version_name)
+        with self.lock:
+            if version != self.version:
+                row_ids = None if self.version is None else changed_rows(
+                    self.version_name, self.version, version)
+                if row_ids is None or \
+                        self.update(self.snapshot, row_ids) is False:
+                    self.snapshot = self.build()
+                self.version = version
+        self.checked = now
+        return self.snapshot
+
+
+'''
+CategoryRegistry
+    the {id: type} category map, served from memory together with its JSON
+    serialization for splicing into responses.
+'''
+
+
+class CategoryRegistry(VersionedCache):
+    version_name = 'categories'
+
+    def build(self):
+        types = {category.id: category.type for category in
+                 Category.query.order_by(Category.id)}
+        return types, json.dumps({str(id): type for id, type in types.items()})
+
+    def types(self):
+        return self._load()[0]
+
+    def json(self):
+        return self._load()[1]
+
+
+'''
+QuestionSampler
+    draws a random question for the quiz. It keeps the question ids of every
+    category (and of all questions, under None) in sorted arrays, which a
+    question write updates in place, so a draw is a random index and a set
+    lookup against the excluded ids; only the question drawn is loaded.
+    draw() gives up after SAMPLE_ATTEMPTS draws in a row hit excluded ids,
+    which means most of the category has been played: remaining() then lists
+    the ids left once, and pop() takes random questions off that list with a
+    swap-remove. Categories are keyed by their id as a string; excluded is
+    anything supporting `in`, such as a set or a SeenSet.
+'''
+
+
+class QuestionSampler(VersionedCache):
+    version_name = 'questions'
+
+    def build(self):
+        ids = {None: array('l')}
+        for category, id in db.session.query(
+                Question.category, Question.id).order_by(Question.id) \
+                .yield_per(10000):
+            ids.setdefault(str(category), array('l')).append(id)
+            ids[None].append(id)
+        return ids
+
+    def update(self, ids, row_ids):
+        categories = dict(db.session.query(Question.id, Question.category)
+                          .filter(Question.id.in_(row_ids)))
+        for id in row_ids:
+            for category_ids in ids.values():
+                index = bisect_left(category_ids, id)
+                if index < len(category_ids) and category_ids[index] == id:
+                    del category_ids[index]
+            if id in categories:
+                for key in (None, str(categories[id])):
+                    category_ids = ids.setdefault(key, array('l'))
+                    # New questions have the highest ids: an append.
+                    category_ids.insert(bisect_left(category_ids, id), id)
+
+    def draw(self, category=None, excluded=()):
+        ids = self._load().get(category, ())
+        for _ in range(SAMPLE_ATTEMPTS):
+            with self.lock:
+                if not ids:
+                    return None
+                question_id = ids[random.randrange(len(ids))]
+            if question_id not in excluded:
+                question = Question.query.get(question_id)
+                # None if deleted since the ids were loaded.
+                if question is not None:
+                    return question
+        return None
+
+    def remaining(self, category=None, excluded=()):
+        ids = self._load().get(category, ())
+        with self.lock:
+            return array('l', (id for id in ids if id not in excluded))
+
+    def pop(self, remaining):
+        while remaining:
+            index = random.randrange(len(remaining))
+            question_id = remaining[index]
+            remaining[index] = remaining[-1]
+            remaining.pop()
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
+        return None
+
+    def sample(self, category=None, excluded=()):
+        # Without a session to keep remaining() in, the fallback scans the
+        # category, which only happens once excluded holds most of it.
+        return self.draw(category, excluded) or \
+            self.pop(self.remaining(category, excluded))
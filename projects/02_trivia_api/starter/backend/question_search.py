@@ -0,0 +1,143 @@
+import math
+import re
+from collections import defaultdict
+
+from sqlalchemy import func
+
+from models import db, Question, VersionedCache, search_vector
+
+# Weights of question and answer words in the in-process index, the defaults
+# Postgres' ts_rank gives to the 'A' and 'B' labels of search_vector.
+QUESTION_WEIGHT = 1.0
+ANSWER_WEIGHT = 0.4
+
+'''
+tokenize(text)
+    the lowercased words of text, which is all the in-process index matches
+    on: no stemming or stop words, unlike Postgres' 'english' configuration.
+'''
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+'''
+QuestionIndex
+    an in-process inverted index over question and answer text, for databases
+    without full-text search (SQLite in development and tests). It maps every
+    word to {question id: weight}, and keeps each question's category and
+    difficulty for filtering and its words for unindexing it. A question
+    write only reindexes the questions the change log names; the index is
+    built from scratch on start and when it fell behind the log.
+'''
+
+
+class QuestionIndex(VersionedCache):
+    version_name = 'questions'
+    columns = (Question.id, Question.question, Question.answer,
+               Question.category, Question.difficulty)
+
+    def build(self):
+        snapshot = defaultdict(dict), {}, {}
+        for row in db.session.query(*self.columns).yield_per(10000):
+            self._index(snapshot, *row)
+        return snapshot
+
+    def update(self, snapshot, row_ids):
+        rows = db.session.query(*self.columns).filter(
+            Question.id.in_(row_ids)).all()
+        for id in row_ids:
+            self._unindex(snapshot, id)
+        for row in rows:
+            self._index(snapshot, *row)
+
+    @staticmethod
+    def _index(snapshot, id, question, answer, category, difficulty):
+        postings, filters, words = snapshot
+        weights = defaultdict(float)
+        for word in tokenize(question):
+            weights[word] += QUESTION_WEIGHT
+        for word in tokenize(answer):
+            weights[word] += ANSWER_WEIGHT
+        for word, weight in weights.items():
+            postings[word][id] = weight
+        filters[id] = (str(category), difficulty)
+        words[id] = tuple(weights)
+
+    @staticmethod
+    def _unindex(snapshot, id):
+        postings, filters, words = snapshot
+        for word in words.pop(id, ()):
+            del postings[word][id]
+            if not postings[word]:
+                del postings[word]
+        filters.pop(id, None)
+
+    def search(self, words, category=None, difficulty=None):
+        # Ids of the questions containing every word, best match first:
+        # summed word weights times inverse document frequency.
+        postings, filters, _ = self._load()
+        with self.lock:
+            matches = sorted((postings.get(word, {}) for word in set(words)),
+                             key=len)
+            if not matches or not matches[0]:
+                return []
+            scores = {}
+            for id in matches[0]:
+                if category is not None and filters[id][0] != category:
+                    continue
+                if difficulty is not None and filters[id][1] != difficulty:
+                    continue
+                if all(id in match for match in matches[1:]):
+                    scores[id] = sum(match[id] * math.log(
+                        1 + len(filters) / len(match)) for match in matches)
+        return sorted(scores, key=lambda id: (-scores[id], id))
+
+
+'''
+QuestionSearch
+    ranked question search, a page at a time. search() returns the page's
+    questions and the total number of matches. On Postgres it matches
+    plainto_tsquery against search_vector, which ix_questions_search indexes,
+    and ranks with ts_rank; elsewhere it uses a QuestionIndex. Without search
+    words it lists the questions matching the filters in id order.
+'''
+
+
+class QuestionSearch:
+
+    def __init__(self):
+        self.index = QuestionIndex()
+
+    def search(self, term, category=None, difficulty=None, page=1,
+               per_page=10):
+        query = Question.query
+        if category is not None:
+            query = query.filter(Question.category == category)
+        if difficulty is not None:
+            query = query.filter(Question.difficulty == difficulty)
+        offset = (page - 1) * per_page
+        words = tokenize(term)
+
+        if not words:
+            total = query.order_by(None).with_entities(
+                func.count(Question.id)).scalar()
+            return query.order_by(Question.id).offset(offset).limit(
+                per_page).all(), total
+
+        if db.engine.dialect.name == 'postgresql':
+            tsquery = func.plainto_tsquery('english', term)
+            query = query.filter(search_vector.op('@@')(tsquery))
+            total = query.order_by(None).with_entities(
+                func.count(Question.id)).scalar()
+            return query.order_by(func.ts_rank(search_vector, tsquery).desc(),
+                                  Question.id).offset(offset).limit(
+                per_page).all(), total
+
+        ids = self.index.search(words, category, difficulty)
+        page_ids = ids[offset:offset + per_page]
+        questions = {question.id: question for question in
+                     Question.query.filter(Question.id.in_(page_ids))} \
+            if page_ids else {}
+        return [questions[id] for id in page_ids if id in questions], len(ids)
@@ -0,0 +1,161 @@
+import json
+import secrets
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+# Seconds a quiz session lives after its last question.
+QUIZ_SESSION_TTL = 30 * 60
+# Question ids per SeenSet chunk: a chunk's bitmask is at most 512 bytes.
+CHUNK_BITS = 4096
+
+'''
+SeenSet
+    the ids of the questions a session has seen, as a roaring-style bitset:
+    one integer bitmask per CHUNK_BITS ids, only for the chunks that have a
+    seen id. Packed, a chunk takes a 6 byte header and a mask of up to 512
+    bytes, so a session costs at most 518 bytes per question played, and much
+    less when the ids played are close together. to_bytes() and from_bytes()
+    pack it for the session store.
+'''
+
+
+class SeenSet:
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks or {}
+
+    def add(self, question_id):
+        high, low = divmod(question_id, CHUNK_BITS)
+        self.chunks[high] = self.chunks.get(high, 0) | 1 << low
+
+    def __contains__(self, question_id):
+        if not isinstance(question_id, int) or question_id < 0:
+            return False
+        high, low = divmod(question_id, CHUNK_BITS)
+        return bool(self.chunks.get(high, 0) >> low & 1)
+
+    def __len__(self):
+        return sum(bin(mask).count('1') for mask in self.chunks.values())
+
+    def to_bytes(self):
+        packed = []
+        for high, mask in sorted(self.chunks.items()):
+            size = (mask.bit_length() + 7) // 8
+            packed.append(struct.pack('>IH', high, size) +
+                          mask.to_bytes(size, 'little'))
+        return b''.join(packed)
+
+    @classmethod
+    def from_bytes(cls, data):
+        chunks = {}
+        offset = 0
+        while offset < len(data):
+            high, size = struct.unpack_from('>IH', data, offset)
+            offset += 6
+            chunks[high] = int.from_bytes(data[offset:offset + size], 'little')
+            offset += size
+        return cls(chunks)
+
+
+'''
+QuizSession
+    a quiz in progress: its category (the category id as a string, None for
+    all categories), the questions it has seen and, once the sampler listed
+    them, the ids of the questions it has left as an array. dumps() and
+    loads() convert it to and from the bytes kept in the session store: a
+    JSON header line (the category, or [category, number of ids left]), the
+    SeenSet bytes and the ids left.
+'''
+
+
+class QuizSession:
+
+    def __init__(self, category=None, seen=None, remaining=None):
+        self.category = category
+        self.seen = seen if seen is not None else SeenSet()
+        self.remaining = remaining
+
+    def dumps(self):
+        if self.remaining is None:
+            return json.dumps(self.category).encode() + b'\n' + \
+                self.seen.to_bytes()
+        return json.dumps([self.category, len(self.remaining)]).encode() + \
+            b'\n' + self.seen.to_bytes() + self.remaining.tobytes()
+
+    @classmethod
+    def loads(cls, data):
+        header, body = data.split(b'\n', 1)
+        header = json.loads(header)
+        if not isinstance(header, list):
+            return cls(header, SeenSet.from_bytes(body))
+        category, count = header
+        remaining = array('l')
+        split = len(body) - count * remaining.itemsize
+        remaining.frombytes(body[split:])
+        return cls(category, SeenSet.from_bytes(body[:split]), remaining)
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+'''
+MemorySessionStore
+    the default quiz session store, in process memory: get(key) returns the
+    bytes last set under key, or None once they were not set again for ttl
+    seconds. compare_and_set(key, expected, value) sets value only if key
+    still holds expected, so two requests updating one session cannot
+    overwrite each other. Every set moves the key to the end of an ordered
+    dict, so the expired sessions are always at the front and evicting them
+    costs nothing for the ones still live. Sessions live in one process: with
+    several workers, pass a store shared between them (anything with the same
+    get, set, compare_and_set and delete methods, e.g. over Redis SETEX and
+    WATCH/MULTI) as QUIZ_SESSION_STORE.
+'''
+
+
+class MemorySessionStore:
+
+    def __init__(self, ttl=QUIZ_SESSION_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()
+
+    def _evict(self, now):
+        while self.sessions:
+            key, (expires, _) = next(iter(self.sessions.items()))
+            if expires > now:
+                break
+            del self.sessions[key]
+
+    def get(self, key):
+        with self.lock:
+            self._evict(time.monotonic())
+            entry = self.sessions.get(key)
+            return entry[1] if entry is not None else None
+
+    def _set(self, key, value):
+        now = time.monotonic()
+        self._evict(now)
+        self.sessions.pop(key, None)
+        self.sessions[key] = (now + self.ttl, value)
+
+    def set(self, key, value):
+        with self.lock:
+            self._set(key, value)
+
+    def compare_and_set(self, key, expected, value):
+        with self.lock:
+            self._evict(time.monotonic())
+            entry = self.sessions.get(key)
+            if entry is None or entry[1] != expected:
+                return False
+            self._set(key, value)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.sessions.pop(key, None)
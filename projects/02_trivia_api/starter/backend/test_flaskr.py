@@ -1,9 +1,13 @@
 import json
 import unittest
+from array import array
 
 from flask_sqlalchemy import SQLAlchemy
 from flaskr import create_app
-from models import setup_db
+from models import setup_db, Category, CategoryRegistry, Question, \
+    QuestionSampler
+from question_search import QuestionIndex
+from quiz_sessions import MemorySessionStore, QuizSession, SeenSet
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -42,6 +46,29 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertTrue(data['categories'])
 
+    def test_category_registry_reloads_after_write(self):
+        with self.app.app_context():
+            registry = CategoryRegistry(ttl=0)
+            before = registry.json()
+            category = Category('Music')
+            category.insert()
+            self.assertEqual(registry.types()[category.id], 'Music')
+            self.assertNotEqual(registry.json(), before)
+
+            category.delete()
+            self.assertEqual(registry.json(), before)
+
+    def test_category_registry_sees_own_writes_before_ttl(self):
+        with self.app.app_context():
+            registry = CategoryRegistry(ttl=3600)
+            registry.types()
+            category = Category('Theatre')
+            category.insert()
+            self.assertEqual(registry.types()[category.id], 'Theatre')
+
+            category.delete()
+            self.assertNotIn(category.id, registry.types())
+
     def test_post_categories(self):
         res = self.client().post('/categories', json={"key": "value"})
         data = json.loads(res.data)
@@ -56,6 +83,40 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['questions'])
         self.assertEqual(len(data['questions']), 10)
 
+    def test_get_questions_per_page(self):
+        res = self.client().get('/questions?per_page=3')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 3)
+        self.assertTrue(data['next_cursor'])
+
+    def test_get_questions_invalid_per_page(self):
+        res = self.client().get('/questions?per_page=1000')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(data['success'])
+
+    def test_get_questions_cursor(self):
+        first = json.loads(self.client().get('/questions?per_page=5').data)
+        res = self.client().get(
+            f"/questions?per_page=5&cursor={first['next_cursor']}")
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], first['total_questions'])
+        self.assertGreater(data['questions'][0]['id'],
+                           first['questions'][-1]['id'])
+
+        # Same questions as the second page.
+        second = json.loads(self.client().get('/questions?per_page=5&page=2')
+                            .data)
+        self.assertEqual(data['questions'], second['questions'])
+
+    def test_get_questions_invalid_cursor(self):
+        res = self.client().get('/questions?cursor=not-a-cursor')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(data['success'])
+
     def test_delete_questions(self):
         res = self.client().delete('/questions')
         data = json.loads(res.data)
@@ -124,6 +185,49 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(searchData['total_questions'],
                          questions_data['total_questions'])
 
+    def test_search_ranks_question_text_first(self):
+        for question, answer in (('Which?', 'Leonardo da Vinci'),
+                                 ('Who painted like Leonardo?', 'Raphael')):
+            self.client().post('/questions', json={
+                'question': question, 'answer': answer,
+                'category': 2, 'difficulty': 3})
+
+        res = self.client().post('/questions/search', json={
+            'searchTerm': 'leonardo', 'category': 2, 'difficulty': 3,
+            'per_page': 1})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertGreaterEqual(data['total_questions'], 2)
+        self.assertEqual(len(data['questions']), 1)
+        self.assertEqual(data['questions'][0]['answer'], 'Raphael')
+
+    def test_question_index_updates_changed_questions(self):
+        with self.app.app_context():
+            index = QuestionIndex(ttl=3600)
+            snapshot = index._load()
+            question = Question('Which bird is the okapi?', 'None',
+                                '1', 1)
+            question.insert()
+            self.assertEqual(index.search(['okapi']), [question.id])
+
+            question.question = 'Which animal is the okapi?'
+            question.update()
+            self.assertEqual(index.search(['animal']), [question.id])
+            self.assertEqual(index.search(['bird', 'okapi']), [])
+
+            question.delete()
+            self.assertEqual(index.search(['okapi']), [])
+            # Patched in place, not rebuilt.
+            self.assertIs(index.snapshot, snapshot)
+
+    def test_search_invalid_page(self):
+        res = self.client().post('/questions/search',
+                                 json={'searchTerm': 'title', 'page': 0})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(data['success'])
+
     def test_search_delete(self):
         res = self.client().delete('/questions/search')
         searchData = json.loads(res.data)
@@ -142,6 +246,104 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertTrue(data['question'])
 
+    def test_quiz_skips_previous_questions(self):
+        res = self.client().get('/questions?category=1&per_page=100')
+        ids = [q['id'] for q in json.loads(res.data)['questions']]
+
+        json_data = {'quiz_category': {'id': 1, 'type': 'Science'},
+                     'previous_questions': ids[1:]}
+        res = self.client().post('/quizzes', json=json_data)
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['question']['id'], ids[0])
+
+        json_data['previous_questions'] = ids
+        res = self.client().post('/quizzes', json=json_data)
+        self.assertIsNone(json.loads(res.data)['question'])
+
+    def test_quiz_without_category(self):
+        res = self.client().post('/quizzes', json={'previous_questions': []})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(data['success'])
+
+    def test_quiz_session(self):
+        res = self.client().post('/quizzes/sessions',
+                                 json={'quiz_category': {'id': 1}})
+        session_id = json.loads(res.data)['session_id']
+        self.assertEqual(res.status_code, 201)
+
+        total = json.loads(self.client().get('/questions?category=1')
+                           .data)['total_questions']
+        seen = set()
+        for _ in range(total):
+            res = self.client().post(f'/quizzes/sessions/{session_id}/next')
+            data = json.loads(res.data)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(int(data['question']['category']), 1)
+            self.assertNotIn(data['question']['id'], seen)
+            seen.add(data['question']['id'])
+        self.assertEqual(data['questions_played'], total)
+
+        res = self.client().post(f'/quizzes/sessions/{session_id}/next')
+        self.assertIsNone(json.loads(res.data)['question'])
+
+    def test_question_sampler_updates_changed_questions(self):
+        with self.app.app_context():
+            sampler = QuestionSampler(ttl=3600)
+            ids = sampler._load()
+            question = Question('Which planet is red?', 'Mars', '1', 1)
+            question.insert()
+            self.assertIn(question.id, sampler._load()['1'])
+
+            question.category = '2'
+            question.update()
+            self.assertNotIn(question.id, sampler._load()['1'])
+            self.assertIn(question.id, sampler._load()['2'])
+
+            question.delete()
+            self.assertNotIn(question.id, sampler._load()[None])
+            # Updated in place, not rebuilt.
+            self.assertIs(sampler._load(), ids)
+
+    def test_quiz_session_round_trip(self):
+        seen = SeenSet()
+        seen.add(3)
+        for remaining in (None, array('l', [4, 5])):
+            session = QuizSession.loads(
+                QuizSession('1', seen, remaining).dumps())
+            self.assertEqual(session.category, '1')
+            self.assertIn(3, session.seen)
+            self.assertEqual(session.remaining, remaining)
+
+    def test_unknown_quiz_session(self):
+        res = self.client().post('/quizzes/sessions/unknown/next')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertFalse(data['success'])
+
+    def test_seen_set_round_trip(self):
+        seen = SeenSet()
+        for question_id in (1, 4095, 4096, 1000000):
+            seen.add(question_id)
+        copy = SeenSet.from_bytes(seen.to_bytes())
+
+        self.assertEqual(len(copy), 4)
+        self.assertIn(1000000, copy)
+        self.assertNotIn(2, copy)
+
+    def test_session_store_compare_and_set(self):
+        store = MemorySessionStore()
+        store.set('quiz', b'first')
+
+        self.assertTrue(store.compare_and_set('quiz', b'first', b'second'))
+        # A concurrent update that read 'first' must not overwrite 'second'.
+        self.assertFalse(store.compare_and_set('quiz', b'first', b'third'))
+        self.assertEqual(store.get('quiz'), b'second')
+        self.assertFalse(store.compare_and_set('gone', None, b'first'))
+
     def test_405_error(self):
         res = self.client().post('/categories', json={'type': 'new'})
 
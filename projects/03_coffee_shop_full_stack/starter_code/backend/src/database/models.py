@@ -1,4 +1,5 @@
 import os
+import sys
 from sqlalchemy import Column, String, Integer
 from flask_sqlalchemy import SQLAlchemy
 import json
@@ -7,15 +8,21 @@ database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
+# pool_config.py is shared with the other backends, in projects/.
+sys.path.append(os.path.join(project_dir, *[os.pardir] * 5))
+from pool_config import engine_options, pool_settings
+
 db = SQLAlchemy()
 
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    the connection pool is sized from the DATABASE_* environment variables shared with the other apps
 '''
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path, pool_settings())
     db.app = app
     db.init_app(app)
 
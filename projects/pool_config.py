@@ -0,0 +1,84 @@
+import os
+
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+
+# ----------------------------------------------------------------------------#
+# Connection pool settings shared by the Fyyur, trivia and coffee shop backends.
+# ----------------------------------------------------------------------------#
+
+# Every backend sizes its connection pool from the same DATABASE_* environment
+# variables, so one deployment's settings mean the same thing to all of them.
+# Each worker process can hold DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW
+# connections per database, which has to stay under the server's
+# max_connections across all workers. The backends import this module by
+# putting this directory on sys.path (see Fyyur's pooling.py, the trivia
+# backend's models.py and the coffee shop's src/database/models.py).
+
+POOL_DEFAULTS = {
+    'DATABASE_POOL_SIZE': 5,
+    'DATABASE_MAX_OVERFLOW': 10,
+    # Seconds to wait for a free connection before giving up.
+    'DATABASE_POOL_TIMEOUT': 30,
+    # Replace connections older than this many seconds, before the server or a
+    # proxy drops them.
+    'DATABASE_POOL_RECYCLE': 1800,
+    'DATABASE_POOL_PRE_PING': True,
+    # Milliseconds; 0 means no limit.
+    'DATABASE_STATEMENT_TIMEOUT': 0,
+    # Set when the database URL points at PgBouncer in transaction pooling mode.
+    'DATABASE_PGBOUNCER': False,
+}
+
+
+def pool_settings(environ=os.environ):
+    # The DATABASE_* settings from environ: integers, or 'true'/'false' for the
+    # switches, with POOL_DEFAULTS for the ones not set.
+    settings = {}
+    for name, default in POOL_DEFAULTS.items():
+        value = environ.get(name)
+        if value is None:
+            settings[name] = default
+        elif isinstance(default, bool):
+            settings[name] = value == 'true'
+        else:
+            settings[name] = int(value)
+    return settings
+
+
+def engine_options(url, config, poolclass=QueuePool):
+    # SQLALCHEMY_ENGINE_OPTIONS for url from the DATABASE_* settings in config.
+    # In-memory SQLite keeps Flask-SQLAlchemy's single static connection.
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    options = {
+        'poolclass': poolclass,
+        'pool_size': config['DATABASE_POOL_SIZE'],
+        'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+        'pool_timeout': config['DATABASE_POOL_TIMEOUT'],
+        'pool_recycle': config['DATABASE_POOL_RECYCLE'],
+        'pool_pre_ping': config['DATABASE_POOL_PRE_PING'],
+    }
+    if url.get_backend_name() == 'sqlite':
+        # A pooled connection to a SQLite file is handed to whichever thread
+        # checks it out next; SQLAlchemy 2 sets this itself, 1.3 does not.
+        options['connect_args'] = {'check_same_thread': False}
+        return options
+    # The default URLs still use the 'postgres' alias SQLAlchemy 1.3 accepts.
+    if url.get_backend_name() not in ('postgresql', 'postgres'):
+        return options
+
+    connect_args = options['connect_args'] = {}
+    if config['DATABASE_PGBOUNCER']:
+        # PgBouncer in transaction mode hands each transaction to any server
+        # connection: prepared statements would not be there next time, and it
+        # rejects the startup options that carry statement_timeout (set that on
+        # the database role instead). psycopg2 never prepares server-side;
+        # psycopg 3 does after prepare_threshold executions unless it is None.
+        if url.get_driver_name() == 'psycopg':
+            connect_args['prepare_threshold'] = None
+    elif config['DATABASE_STATEMENT_TIMEOUT']:
+        connect_args['options'] = f"-c statement_timeout={config['DATABASE_STATEMENT_TIMEOUT']}"
+    return options